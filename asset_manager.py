@@ -0,0 +1,118 @@
+"""
+Process-wide image cache shared by every screen and the simulation core.
+
+Images are decoded, scaled and converted once per (path, size, alpha) and handed
+out as shared surfaces. Screens acquire images under a scene name and release
+them all with `unload_scene`; released images stay in a bounded pool of
+unreferenced surfaces so returning to a menu is instant, and are only freed when
+that pool goes over budget or `purge` is called.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import pygame as pg
+
+Key = Tuple[str, Optional[Tuple[int, int]], bool]
+
+
+class AssetManager:
+    """
+    Reference-counted cache of converted surfaces keyed by (path, size, alpha).
+    Images requested without a scene are permanent (sprites used everywhere).
+    """
+    def __init__(self, unreferenced_budget=64 * 1024 * 1024):
+        """
+        Args:
+            unreferenced_budget (int): Bytes of released-but-kept surfaces before
+                the least recently released ones are freed.
+        """
+        self.unreferenced_budget = unreferenced_budget
+        self._surfaces: Dict[Key, Optional[pg.Surface]] = {}
+        self._refs: Dict[Key, int] = {}
+        self._scenes: Dict[str, Set[Key]] = {}
+        self._permanent: Set[Key] = set()
+        self._unreferenced: "OrderedDict[Key, int]" = OrderedDict()  # key -> bytes
+        self._unreferenced_bytes = 0
+        self.loads = 0
+
+    def image(self, path: str, size=None, alpha=True, scene: Optional[str] = None) -> Optional[pg.Surface]:
+        """
+        Return the image at `path`, scaled to `size` if given. Returns None (and
+        logs once) if it can't be read. With `scene`, the image is referenced by
+        that scene until `unload_scene(scene)`.
+        """
+        key = (path, (int(size[0]), int(size[1])) if size else None, alpha)
+        if key not in self._surfaces:
+            self._surfaces[key] = self._load(path, key[1], alpha)
+        if scene is None:
+            self._permanent.add(key)
+            self._revive(key)
+        else:
+            keys = self._scenes.setdefault(scene, set())
+            if key not in keys:
+                keys.add(key)
+                self._refs[key] = self._refs.get(key, 0) + 1
+                self._revive(key)
+        return self._surfaces[key]
+
+    def unload_scene(self, scene: str):
+        """
+        Drop every reference held by `scene`. Images nothing else uses move to
+        the unreferenced pool.
+        """
+        for key in self._scenes.pop(scene, ()):
+            self._refs[key] -= 1
+            if self._refs[key] <= 0:
+                del self._refs[key]
+                if key not in self._permanent:
+                    self._retire(key)
+
+    def purge(self):
+        """
+        Free every unreferenced image now.
+        """
+        for key in list(self._unreferenced):
+            self._surfaces.pop(key, None)
+        self._unreferenced.clear()
+        self._unreferenced_bytes = 0
+
+    def refcount(self, path: str, size=None, alpha=True) -> int:
+        """
+        Number of scenes currently holding the given image.
+        """
+        return self._refs.get((path, tuple(size) if size else None, alpha), 0)
+
+    def __contains__(self, path: str) -> bool:
+        return any(key[0] == path for key in self._surfaces)
+
+    def _load(self, path, size, alpha):
+        try:
+            img = pg.image.load(path)
+            if size and img.get_size() != size:
+                img = pg.transform.scale(img, size)
+            if pg.display.get_surface() is not None:
+                img = img.convert_alpha() if alpha else img.convert()
+            self.loads += 1
+            return img
+        except Exception as e:
+            print(f"Failed to load {path}:", e)
+            return None
+
+    def _revive(self, key):
+        nbytes = self._unreferenced.pop(key, None)
+        if nbytes is not None:
+            self._unreferenced_bytes -= nbytes
+
+    def _retire(self, key):
+        img = self._surfaces.get(key)
+        nbytes = img.get_width() * img.get_height() * 4 if img else 0
+        self._unreferenced[key] = nbytes
+        self._unreferenced_bytes += nbytes
+        while self._unreferenced_bytes > self.unreferenced_budget and self._unreferenced:
+            old_key, old_bytes = self._unreferenced.popitem(last=False)
+            self._surfaces.pop(old_key, None)
+            self._unreferenced_bytes -= old_bytes
+
+
+# The one cache every module loads images through
+assets = AssetManager()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the simulation and rendering hot paths.
+
+Runs on SDL's dummy video driver with seeded RNGs, so results are comparable
+between machines without a display and across commits:
+
+    python3 bench.py --out bench.json
+    python3 bench.py --quick            # fewer iterations, for a smoke check
+
+Measures Stage.update + every Enemy.update at 10/100/1000 mobs (per object and
+batched through horde.EnemyStore when NumPy is installed), Entity.move
+against growing platform counts, Stage.make_platforms, Stage.draw + present()
+at 1×, 2× and a fractional window scale, and save/load round-trips. Every
+result is reported per operation so different iteration counts compare.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # keep stdout pure JSON
+
+import pygame as pg
+
+from game_core import (DESIGN_W, DESIGN_H, WIDTH, HEIGHT, GRAVITY, Enemy, Player, Stage,
+                       random_armour_piece, random_weapon)
+from horde import EnemyStore, HAVE_NUMPY
+from savegame import SaveWriter
+
+
+def measure(fn, iterations, warmup=1):
+    """
+    Call `fn` `iterations` times after `warmup` untimed calls.
+    Returns the total seconds, mean ms per call and calls per second.
+    """
+    for _ in range(warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "seconds": elapsed,
+        "ms_per_op": elapsed * 1000.0 / iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else 0.0,
+    }
+
+
+def make_stage(seed, mobs=10):
+    """
+    A stage-1 layout from `seed` holding exactly `mobs` regular enemies.
+    """
+    rng = random.Random(seed)
+    stage = Stage(1, rng)
+    stage.mobs = []
+    for _ in range(mobs):
+        stage.mobs.append(Enemy(rng.randint(100, WIDTH-100), 100, 50, 7, (200, 200, 50), rng))
+    return stage
+
+
+def bench_mobs(seed, counts, ticks, batched=False):
+    """
+    Stage.update plus every Enemy.update per tick, as GameSession.tick runs them
+    (with the stage's perception and navigation graph). Mobs can't die, so each
+    size keeps its mob count for the whole run; "mobs" reports it at the end.
+    With `batched`, the mobs go through the NumPy EnemyStore instead.
+    """
+    results = {}
+    for n in counts:
+        stage = make_stage(seed, n)
+        for mob in stage.mobs:
+            mob.hp = mob.max_hp = 10 ** 9  # fall damage must not thin the crowd
+        player = Player(100, HEIGHT-200)
+        player.hp = player.max_hp = 10 ** 9  # contact damage must not end the run
+        state = {"now": 0.0}
+        store = EnemyStore(GRAVITY) if batched else None
+
+        def tick():
+            state["now"] += 1000 / 60
+            stage.perception.begin_tick()
+            stage.update(player)
+            if store is not None:
+                store.update(stage.mobs, player, stage.grid, state["now"], stage.perception, stage.nav)
+                return
+            for mob in stage.mobs:
+                mob.update(player, stage.grid, state["now"], stage.perception, stage.nav)
+        r = measure(tick, max(30, ticks))
+        r["ticks_per_sec"] = r.pop("ops_per_sec")
+        r["mobs"] = len(stage.mobs)
+        results[str(n)] = r
+    return results
+
+
+def random_platforms(rng, count):
+    """
+    `count` non-ground platforms scattered over the stage, plus the ground last.
+    """
+    platforms = [pg.Rect(rng.randint(0, WIDTH-200), rng.randint(60, HEIGHT-140), rng.randint(80, 300), 20)
+                 for _ in range(count)]
+    platforms.append(pg.Rect(0, HEIGHT-100, WIDTH, 100))
+    return platforms
+
+
+def bench_move(seed, platform_counts, steps):
+    """
+    Entity.move for 50 falling/walking entities against `platform_counts` platforms.
+    """
+    results = {}
+    for count in platform_counts:
+        rng = random.Random(seed)
+        stage = make_stage(seed, 0)
+        stage.set_platforms(random_platforms(rng, count))
+        movers = [Enemy(rng.randint(0, WIDTH-40), rng.randint(0, HEIGHT-150), 10, 1, (0, 0, 0), rng) for _ in range(50)]
+        for m in movers:
+            m.vx = rng.choice([-3, 3])
+
+        def step():
+            for m in movers:
+                m.vy = min(m.vy + 0.6, 12)
+                m.move(m.vx, m.vy, stage.grid)
+                if m.rect.left <= 0 or m.rect.right >= WIDTH:
+                    m.vx = -m.vx
+                if m.on_ground and rng.random() < 0.02:
+                    m.vy = -14
+        r = measure(step, steps)
+        r["moves_per_sec"] = r["ops_per_sec"] * len(movers)
+        results[str(count)] = r
+    return results
+
+
+def bench_make_platforms(seed, iterations):
+    """
+    Procedural platform layout for one stage.
+    """
+    stage = make_stage(seed, 0)
+    return measure(stage.make_platforms, iterations)
+
+
+def bench_draw_present(seed, scales, frames):
+    """
+    Stage.draw into the logical screen plus present() to a window of each scale.
+    Imports the windowed game module, which opens the (dummy) display.
+    """
+    import underground_anime_platformer as game
+    results = {}
+    for label, factor in scales:
+        size = (int(DESIGN_W * factor), int(DESIGN_H * factor))
+        game.window = pg.display.set_mode(size)
+        game.compute_scale_and_offset()
+        stage = make_stage(seed, 10)
+        player = Player(100, HEIGHT-200)
+
+        def frame():
+            stage.draw(game.screen)
+            player.draw(game.screen, 0)
+            game.present()
+        r = measure(frame, frames, warmup=3)
+        r["fps"] = r.pop("ops_per_sec")
+        r["window"] = list(size)
+        results[label] = r
+    return results
+
+
+def bench_save_load(seed, iterations):
+    """
+    save_player_data + load_player_data round-trips through the background
+    writer, against a save file in a temporary directory.
+    """
+    import underground_anime_platformer as game
+    rng = random.Random(seed)
+    player = Player(100, HEIGHT-200)
+    player.inventory = [random_weapon(rng=rng) if rng.random() < 0.5 else random_armour_piece("chest", rng=rng)
+                        for _ in range(10)]
+    player.coins, player.xp = 1234, 5678
+    loaded = Player(100, HEIGHT-200)
+    original = game.save_writer
+    with tempfile.TemporaryDirectory() as tmp:
+        game.save_writer = SaveWriter(os.path.join(tmp, "player_save.dat"), backups=3)
+        try:
+            def round_trip():
+                game.save_player_data(player)
+                game.load_player_data(loaded)  # waits for the write to land
+            r = measure(round_trip, iterations)
+            r["bytes"] = os.path.getsize(game.save_writer.path)
+        finally:
+            game.save_writer = original
+    return r
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(seed=1, quick=False):
+    """
+    Run every benchmark and return the results as a JSON-serialisable dict.
+    """
+    k = 0.1 if quick else 1.0
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pg.version.ver,
+            "platform": platform.platform(),
+            "seed": seed,
+            "quick": quick,
+        },
+        "mobs": bench_mobs(seed, [10, 100, 1000], int(600 * k)),
+        "mobs_batched": bench_mobs(seed, [10, 100, 1000], int(600 * k), batched=True) if HAVE_NUMPY else None,
+        "move": bench_move(seed, [10, 100, 1000], int(600 * k)),
+        "make_platforms": bench_make_platforms(seed, int(2000 * k)),
+        "draw_present": bench_draw_present(seed, [("1x", 1.0), ("2x", 2.0), ("0.75x", 0.75)], int(120 * k)),
+        "save_load": bench_save_load(seed, int(200 * k)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark simulation and rendering hot paths.")
+    parser.add_argument("--seed", type=int, default=1, help="RNG seed")
+    parser.add_argument("--quick", action="store_true", help="run a tenth of the iterations")
+    parser.add_argument("--out", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    results = run(args.seed, args.quick)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
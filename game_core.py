@@ -0,0 +1,1462 @@
+"""
+Simulation core for the underground platformer.
+
+Everything in here (items, entities, combat, enemy AI, stages) can be imported and
+stepped without opening a window: images are only decoded the first time something
+is drawn, and input/time are passed in explicitly instead of read from pygame.
+"""
+import pygame as pg, math, random
+import glob, json, os
+from typing import List, Dict, Optional, Tuple
+from render_cache import scaled, sprite_cache
+from asset_manager import assets
+from profiler import profiler
+from horde import EnemyStore, HAVE_NUMPY
+from perception import Perception
+from navgraph import NavGraph, JUMP
+from pool import Pool, swap_remove
+
+# ----------------------------- IMAGE LOADING --------------------------
+def load_image(path: str, alpha=True) -> Optional[pg.Surface]:
+    """
+    Load an image once through the shared asset manager. Returns None (and logs)
+    if it can't be read. Surfaces are only converted to the display format when
+    a display exists, so this is safe to call headless.
+    """
+    return assets.image(path, alpha=alpha)
+
+_atlas_cache: Dict[str, List[pg.Surface]] = {}
+
+def load_atlas(index_path: str) -> List[pg.Surface]:
+    """
+    Load the frames of a packed atlas (see slice_sheet.py): one image decode,
+    then each frame is a subsurface at the rect listed in the JSON index.
+    """
+    if index_path not in _atlas_cache:
+        frames = []
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            atlas = load_image(os.path.join(os.path.dirname(index_path), index["image"]))
+            if atlas:
+                frames = [atlas.subsurface(pg.Rect(r)) for r in index["frames"]]
+        except Exception as e:
+            print(f"Failed to load atlas {index_path}:", e)
+        _atlas_cache[index_path] = frames
+    return _atlas_cache[index_path]
+
+# ----------------------------- ANIMSPRITE CLASS -----------------------
+class AnimSprite:
+    """
+    Handles loading and animating a sequence of PNG images from a folder
+    or from a packed atlas.
+    """
+    def __init__(self, folder, fps=10, loop=True):
+        """
+        Initialize the animation sprite from a folder of images.
+        Args:
+            folder (str | list): Glob of PNGs, an atlas index (.json) built by
+                slice_sheet.py, or an explicit list of frame paths.
+            fps (int): Frames per second.
+            loop (bool): Whether to loop the animation.
+        """
+        # folder contains 32×32 PNGs – already sliced; decoded on first use
+        self.folder = folder
+        self._frames = None
+        self._variants = None
+        self.timer = 0
+        self.idx = 0
+        self.fps = fps
+        self.loop = loop
+    @property
+    def frames(self):
+        """
+        The animation frames, loaded the first time they are needed.
+        """
+        if self._frames is None:
+            if isinstance(self.folder, (list, tuple)):
+                self._frames = [img for img in (load_image(f) for f in self.folder) if img]
+            elif self.folder.endswith(".json"):
+                self._frames = load_atlas(self.folder)
+            else:
+                self._frames = [img for img in (load_image(f) for f in sorted(glob.glob(self.folder))) if img]
+        return self._frames
+    def update(self, dt):
+        """
+        Advance the animation timer by dt milliseconds.
+        """
+        self.timer += dt
+        if self.timer > 1000/self.fps:
+            self.timer = 0
+            next_idx = self.idx + 1
+            if next_idx >= len(self.frames):
+                next_idx = 0 if self.loop else len(self.frames)-1
+            self.idx = next_idx
+    @property
+    def variants(self):
+        """
+        Per frame, its pre-built copies keyed by (flip_x, alpha); see frame_variants().
+        """
+        if self._variants is None:
+            self._variants = [frame_variants(f) for f in self.frames]
+        return self._variants
+    def image(self, flip_x=False, alpha=None):
+        """
+        Return the current animation frame (pygame.Surface).
+        Args:
+            flip_x (bool): Mirrored horizontally (facing left).
+            alpha (int | None): FLICKER_ALPHA for the translucent copy, None for opaque.
+        The frame and its variants are shared; callers must not modify them.
+        """
+        if not flip_x and alpha is None:
+            return self.frames[self.idx]
+        return self.variants[self.idx][(flip_x, alpha)]
+
+FLICKER_ALPHA = 128  # invincibility flicker
+_variant_cache: Dict[int, Tuple[pg.Surface, Dict[tuple, pg.Surface]]] = {}
+
+def frame_variants(frame: pg.Surface) -> Dict[tuple, pg.Surface]:
+    """
+    The drawable copies of one animation frame, built once per frame: plain and
+    mirrored, each opaque (alpha None) and at FLICKER_ALPHA. Shared by every
+    AnimSprite using the frame, so drawing any facing is a lookup and a blit.
+    """
+    entry = _variant_cache.get(id(frame))
+    # the frame is kept in the entry so its id can't be reused while cached
+    if entry is None or entry[0] is not frame:
+        flipped = pg.transform.flip(frame, True, False)
+        variants = {(False, None): frame, (True, None): flipped}
+        for flip_x, img in ((False, frame), (True, flipped)):
+            faded = img.copy()
+            faded.set_alpha(FLICKER_ALPHA)
+            variants[(flip_x, FLICKER_ALPHA)] = faded
+        entry = _variant_cache[id(frame)] = (frame, variants)
+    return entry[1]
+
+# Animation sets, declared per owner in assets/animations.json:
+#   {"player": {"idle": {"frames": ["assets/Attack_1.png"], "fps": 10, "loop": true}}}
+# Frame images go through the shared asset cache, so every Player draws from the
+# same decoded surfaces and only the listed files are ever loaded.
+ANIM_MANIFEST = "assets/animations.json"
+DEFAULT_ANIMATIONS = {
+    "player": {"idle": {"frames": ["assets/Attack_1.png"], "fps": 10, "loop": True}},
+}
+_anim_manifest: Optional[Dict[str, Dict[str, dict]]] = None
+
+def load_anim_manifest(path=ANIM_MANIFEST) -> Dict[str, Dict[str, dict]]:
+    """
+    Read the animation manifest once. Falls back to DEFAULT_ANIMATIONS (and logs)
+    if the file is missing or malformed.
+    """
+    global _anim_manifest
+    if _anim_manifest is None:
+        try:
+            with open(path) as f:
+                _anim_manifest = json.load(f)
+        except Exception as e:
+            print(f"Failed to load animation manifest {path}:", e)
+            _anim_manifest = DEFAULT_ANIMATIONS
+    return _anim_manifest
+
+def make_anim(owner: str, name="idle") -> AnimSprite:
+    """
+    Create an AnimSprite for one animation of `owner` as listed in the manifest.
+    Frames are decoded on first draw and shared between instances.
+    """
+    anims = load_anim_manifest().get(owner) or DEFAULT_ANIMATIONS.get(owner, {})
+    spec = anims.get(name) or DEFAULT_ANIMATIONS[owner][name]
+    return AnimSprite(spec["frames"], fps=spec.get("fps", 10), loop=spec.get("loop", True))
+
+# ----------------------------- CONFIG ---------------------------------
+# Logical (design) resolution used by the game code
+DESIGN_W, DESIGN_H = 1200, 700
+FPS = 60
+# The simulation always advances in fixed steps of SIM_DT_MS, whatever the render rate.
+# Per-tick constants below (GRAVITY, MOVE_SPEED, projectile ttl, awareness gain) assume it.
+SIM_DT_MS = 1000 / FPS
+GRAVITY = 0.6
+JUMP_STR = -14
+MOVE_SPEED = 5
+BLOCK_CD = 5000  # ms
+BACKSTAB_DEG = 120  # deg behind enemy
+DAGGER_RANGE = 90
+SWORD_RANGE = 120
+RAPIER_RANGE = 145
+THROWN_RAPIER_SPEED = 12
+FIST_RANGE=90
+FIST_DAMAGE=4
+FIST_SPEED=150
+# Stages with at least this many mobs update them as one NumPy batch (see horde.py);
+# below it the per-object loop is cheaper than loading the arrays
+HORDE_MIN_MOBS = 80
+# Layout limits Stage.make_platforms keeps between consecutive platforms; the
+# enemy navigation graph uses the same limits for its jump edges
+PLATFORM_MAX_JUMP = 160  # Player can jump about 160px
+PLATFORM_MAX_DX = 260    # Max horizontal jump distance (tunable)
+WIDTH, HEIGHT = DESIGN_W, DESIGN_H
+
+# rarity colours
+RARITY_COL = {
+    "common": (200, 200, 200),
+    "uncommon": (50, 200, 50),
+    "rare": (50, 150, 255),
+    "holy": (255, 215, 0),
+    "godlike": (255, 50, 255),
+}
+RARITY_LVL = {"common": 1, "uncommon": 2, "rare": 3, "holy": 4, "godlike": 5}
+# ----------------------------------------------------------------------
+
+def sign(x):
+    """
+    Return 1 if x > 0, -1 if x < 0, 0 if x == 0.
+    """
+    return 1 if x > 0 else -1 if x < 0 else 0
+def dist(a, b):
+    """
+    Return the Euclidean distance between points a and b.
+    """
+    return math.hypot(a[0]-b[0], a[1]-b[1])
+def angle(a, b):
+    """
+    Return the angle in degrees from point a to point b.
+    """
+    return math.degrees(math.atan2(b[1]-a[1], b[0]-a[0]))
+
+# ----------------------------- ITEMS ----------------------------------
+class Item:
+    # fixed layout: inventories, saves and drops hold many of these
+    __slots__ = ("name", "type", "rarity", "dmg", "attack_speed")
+    # per-type base stats, shared by every item of that type
+    BASE_DMG = {"dagger": 12, "sword": 10, "rapier": 14}  # dagger base damage increased
+    BASE_AS = {"dagger": 200, "sword": 400, "rapier": 500}  # ms between attacks
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'type': self.type,
+            'rarity': self.rarity
+        }
+
+    @staticmethod
+    def from_dict(data):
+        if data is None:
+            return None
+        return Item(data['name'], data['type'], data['rarity'])
+    """
+    Represents a weapon or armor item with stats and sprite.
+    """
+    def __init__(self, name: str, type_: str, rarity: str):
+        """
+        Initialize an item.
+        Args:
+            name (str): Name of the item.
+            type_ (str): Type (dagger, sword, rapier, helmet, chest, legs, boots).
+            rarity (str): Rarity string.
+        """
+        self.name = name
+        self.type = type_  # dagger/sword/rapier/helmet/chest/legs/boots
+        self.rarity = rarity
+        self.dmg = self.base_dmg()
+        self.attack_speed = self.base_as()
+    def base_dmg(self):
+        """
+        Return base damage for the item type.
+        """
+        return Item.BASE_DMG.get(self.type, 0)
+    def base_as(self):
+        """
+        Return base attack speed for the item type.
+        """
+        return Item.BASE_AS.get(self.type, 0)
+    def upgrade(self):
+        """
+        Upgrade the item's rarity and stats.
+        """
+        order = ["common","uncommon","rare","holy","godlike"]
+        idx = order.index(self.rarity)
+        if idx < len(order)-1:
+            self.rarity = order[idx+1]
+            self.dmg = int(self.dmg * 1.5)
+            self.attack_speed = int(self.attack_speed * 0.9)
+    def colour(self):
+        """
+        Return the color for the item's rarity.
+        """
+        return RARITY_COL[self.rarity]
+    # Sprites for weapons by type, and for armour by set and slot
+    WEAPON_SPRITES = {
+        "dagger": "assets/dagger.png",
+        "sword": "assets/sword.png",
+        "rapier": "assets/rapier.png",
+    }
+    ARMOR_SPRITES = {
+        "ninja": {
+            "helmet": "assets/ninja-helmet.png",
+            "chest": "assets/ninja-chestplate.png",
+            "legs": "assets/ninja-legs.png",
+            "boots": "assets/ninja-boots.png"
+        },
+        "knight": {
+            "helmet": "assets/knight-helmet.png",
+            "chest": "assets/knight-chestplate.png",
+            "legs": "assets/knight-leggings.png",
+            "boots": "assets/knight-boots.png"
+        },
+        "mage": {
+            "helmet": "assets/mage-helmet.png",
+            "chest": "assets/mage-chestplate.png",
+            "legs": "assets/mage-leggings.png",
+            "boots": "assets/mage-boots.png"
+        }
+    }
+    # Thick, vivid 'L' rarity indicator colours
+    RARITY_STRIPE_COL = {
+        "common": (200, 200, 200),         # bright grey
+        "uncommon": (0, 255, 0),           # bright green
+        "rare": (0, 120, 255),             # bright blue
+        "holy": (200, 0, 255),             # bright purple
+        "godlike": (255, 220, 40),         # gold/yellow
+    }
+    def sprite_path(self):
+        """
+        Return the sprite file for this item, or None if it has none.
+        """
+        if self.type in Item.WEAPON_SPRITES:
+            return Item.WEAPON_SPRITES[self.type]
+        prefix = self.name.split()[0].lower() if self.name else ""
+        return Item.ARMOR_SPRITES.get(prefix, {}).get(self.type)
+    def icon(self, size=30):
+        """
+        Return the finished icon (sprite or fallback shape plus rarity stripe).
+        Icons are built once per (sprite, type, rarity, size) and shared.
+        """
+        path = self.sprite_path()
+        key = ("item", path, self.type, self.rarity, size)
+        return sprite_cache.build(key, lambda: self._render_icon(path, size))
+    def _render_icon(self, path, size):
+        """
+        Compose the icon for `icon()` on a fresh transparent surface.
+        """
+        icon = pg.Surface((size, size), pg.SRCALPHA)
+        c = self.colour()
+        sprite = load_image(path) if path else None
+        if sprite:
+            icon.blit(pg.transform.scale(sprite, (size, size)), (0, 0))
+        elif self.type in Item.WEAPON_SPRITES:
+            pg.draw.rect(icon, c, (0, 0, size, size//3))
+        else:  # armour piece
+            pg.draw.circle(icon, c, (size//2, size//2), size//2)
+        # Draw a thick, vivid 'L' rarity indicator: diagonal (middle left to bottom left), then horizontal (bottom left to middle bottom)
+        stripe_col = Item.RARITY_STRIPE_COL.get(self.rarity, (200,200,200))
+        thickness = max(5, size//6)
+        # Diagonal: from (0, size//4) to (0, size-1) (start higher for longer line)
+        pg.draw.line(icon, stripe_col, (0, size//4), (0, size-1), thickness)
+        # Horizontal: from (0, size-1) to (size//2 + size//6, size-1) (extend further right)
+        pg.draw.line(icon, stripe_col, (0, size-1), (size//2 + size//6, size-1), thickness)
+        if pg.display.get_surface() is not None:
+            icon = icon.convert_alpha()
+        return icon
+    def draw(self, surf, x, y, size=30):
+        """
+        Draw the item icon on the given surface.
+        """
+        surf.blit(self.icon(size), (x, y))
+
+def random_weapon(rarity: Optional[str]=None, rng=random) -> Item:
+    """
+    Return a random weapon item, optionally of a given rarity.
+    `rng` is the run's random stream (defaults to the global one).
+    """
+    if rarity is None:
+        r = rng.choices(["common","uncommon","rare","holy","godlike"],
+                        weights=[50,30,15,4,1])[0]
+    else: r = rarity
+    t = rng.choice(["dagger","sword","rapier"])
+    return Item(t, t, r)
+
+def random_armour_piece(slot: str, rarity: Optional[str]=None, rng=random) -> Item:
+    """
+    Return a random armor item for the given slot and optional rarity.
+    `rng` is the run's random stream (defaults to the global one).
+    """
+    if rarity is None:
+        r = rng.choices(["common","uncommon","rare","holy","godlike"],
+                        weights=[50,30,15,4,1])[0]
+    else: r = rarity
+    name = rng.choice(["ninja","knight","mage"]) + " " + slot
+    return Item(name, slot, r)
+
+class Drop:
+    """
+    An item lying on the stage floor. Pooled through `drop_pool`.
+    """
+    __slots__ = ("item", "x", "y")
+    def __init__(self, item: Item, x, y):
+        self.reset(item, x, y)
+    def reset(self, item: Item, x, y):
+        """
+        Place `item` on the floor at (x, y) (reuses the record from `drop_pool`).
+        """
+        self.item = item
+        self.x, self.y = x, y
+    def draw(self, surf):
+        """
+        Draw the dropped item's icon.
+        """
+        self.item.draw(surf, self.x, self.y)
+
+drop_pool: Pool[Drop] = Pool(Drop)
+
+# ----------------------------- INPUT ----------------------------------
+class InputState:
+    """
+    One tick worth of player input. The windowed game fills this from the
+    keyboard/mouse; headless runs build it directly.
+    """
+    def __init__(self, left=False, right=False, jump=False, attack=False,
+                 ability=False, pickup=False, aim=(0, 0)):
+        """
+        Args:
+            left, right, jump (bool): Movement keys held (A, D, W/SPACE).
+            attack (bool): Left mouse button held.
+            ability (bool): Q held (sword block / rapier throw).
+            pickup (bool): SPACE was pressed this tick (pick up nearby drop).
+            aim (tuple): Aim point in logical game coordinates.
+        """
+        self.left = left
+        self.right = right
+        self.jump = jump
+        self.attack = attack
+        self.ability = ability
+        self.pickup = pickup
+        self.aim = aim
+
+# ----------------------------- COLLISION ------------------------------
+class PlatformGrid:
+    """
+    Uniform-grid broad phase over a stage's static platforms.
+    Each platform is registered in every cell it overlaps, so collision, ledge and
+    line-of-sight queries only test platforms in nearby cells instead of all of them.
+    Iterating the grid yields every platform in stage order.
+    """
+    def __init__(self, platforms: List[pg.Rect], cell=256):
+        """
+        Build the grid once for a list of platform rects.
+        Args:
+            platforms (list): Platform rects (must not move afterwards).
+            cell (int): Cell size in pixels.
+        """
+        self.platforms = platforms
+        self.cell = cell
+        # cell -> bitmask of platform indices; OR-ing masks dedupes and keeps stage order
+        self.cells: Dict[Tuple[int, int], int] = {}
+        for i, p in enumerate(platforms):
+            for cx in range(p.left // cell, (p.right - 1) // cell + 1):
+                for cy in range(p.top // cell, (p.bottom - 1) // cell + 1):
+                    self.cells[(cx, cy)] = self.cells.get((cx, cy), 0) | (1 << i)
+        self._lists: Dict[int, List[pg.Rect]] = {0: []}  # mask -> platforms, filled on demand
+    def __iter__(self):
+        return iter(self.platforms)
+    def __len__(self):
+        return len(self.platforms)
+    def _platforms_for(self, mask):
+        """
+        Return the platforms in a cell mask, in stage order so collision
+        resolution matches a full scan. Lists are memoized per mask.
+        """
+        found = self._lists.get(mask)
+        if found is None:
+            found = []
+            bits = mask
+            while bits:
+                low = bits & -bits
+                found.append(self.platforms[low.bit_length() - 1])
+                bits ^= low
+            self._lists[mask] = found
+        return found
+    def near(self, rect):
+        """
+        Return the platforms that could touch the given rect.
+        """
+        c = self.cell
+        cells = self.cells
+        mask = 0
+        for cx in range(rect.left // c, rect.right // c + 1):
+            for cy in range(rect.top // c, rect.bottom // c + 1):
+                mask |= cells.get((cx, cy), 0)
+        return self._platforms_for(mask)
+    def near_line(self, a, b):
+        """
+        Return the platforms that could intersect the segment a-b, walking only
+        the cells the segment passes through.
+        """
+        c = self.cell
+        cells = self.cells
+        x0, y0 = a
+        x1, y1 = b
+        cx, cy = int(x0) // c, int(y0) // c
+        end_x, end_y = int(x1) // c, int(y1) // c
+        dx, dy = x1 - x0, y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # parametric distance (0..1 along the segment) to the next cell boundary on each axis
+        t_max_x = ((cx + (step_x > 0)) * c - x0) / dx if dx else math.inf
+        t_max_y = ((cy + (step_y > 0)) * c - y0) / dy if dy else math.inf
+        t_dx = c / abs(dx) if dx else math.inf
+        t_dy = c / abs(dy) if dy else math.inf
+        mask = cells.get((cx, cy), 0)
+        for _ in range(abs(end_x - cx) + abs(end_y - cy)):
+            if t_max_x < t_max_y:
+                cx += step_x
+                t_max_x += t_dx
+            else:
+                cy += step_y
+                t_max_y += t_dy
+            mask |= cells.get((cx, cy), 0)
+        return self._platforms_for(mask)
+
+# ----------------------------- ENTITY ---------------------------------
+class Entity:
+    """
+    Base class for all moving game entities (player, enemies, etc).
+    Entities and their subclasses use __slots__: every field is declared up
+    front, which keeps instances small and attribute access fast in the update loops.
+    """
+    __slots__ = ("rect", "prev_x", "prev_y", "vx", "vy", "hp", "max_hp", "colour", "facing", "on_ground")
+    def __init__(self, x, y, w, h, hp, colour):
+        """
+        Initialize an entity.
+        Args:
+            x, y (int): Position.
+            w, h (int): Size.
+            hp (int): Health points.
+            colour (tuple): RGB color.
+        """
+        self.rect = pg.Rect(x, y, w, h)
+        self.prev_x, self.prev_y = x, y  # position before the last tick, for interpolation
+        self.vx, self.vy = 0, 0
+        self.hp = self.max_hp = hp
+        self.colour = colour
+        self.facing = 1
+        self.on_ground = False
+    def snapshot(self):
+        """
+        Remember the current position as the start point for render interpolation.
+        """
+        self.prev_x, self.prev_y = self.rect.x, self.rect.y
+    def render_rect(self, alpha=1.0):
+        """
+        Return the rect to draw at, interpolated between the previous and current
+        tick by alpha (0..1). alpha=1 is the current simulated position.
+        """
+        if alpha >= 1.0:
+            return self.rect
+        x = self.prev_x + (self.rect.x - self.prev_x) * alpha
+        y = self.prev_y + (self.rect.y - self.prev_y) * alpha
+        return pg.Rect(round(x), round(y), self.rect.w, self.rect.h)
+    def bounds(self, alpha=1.0):
+        """
+        Screen area this entity touches when drawn (sprite plus health bar).
+        """
+        r = self.render_rect(alpha)
+        return pg.Rect(r.x-10, r.y-20, r.w+20, r.h+20)
+    def draw_bar(self, surf, off=-20, rect=None):
+        """
+        Draw the health bar above the entity (or above `rect` if given).
+        """
+        rect = rect or self.rect
+        pg.draw.rect(surf, (50,50,50), (rect.x-10, rect.y+off, rect.w+20, 6))
+        pg.draw.rect(surf, (0,200,0), (rect.x-10, rect.y+off,
+                                        int((rect.w+20)*(self.hp/self.max_hp)), 6))
+    def move(self, dx, dy, grid: PlatformGrid):
+        """
+        Move the entity and handle collisions with platforms.
+        Only platforms near the swept area are tested.
+        """
+        swept = self.rect.union(self.rect.move(dx, dy)).inflate(2, 2)
+        platforms = grid.near(swept)
+        self.rect.x += dx
+        for p in platforms:
+            if p.colliderect(self.rect):
+                if dx > 0: self.rect.right = p.left
+                elif dx < 0: self.rect.left = p.right
+        self.rect.y += dy
+        self.on_ground = False
+        for p in platforms:
+            if p.colliderect(self.rect):
+                if dy > 0:
+                    self.rect.bottom = p.top
+                    self.on_ground = True
+                    self.vy = 0
+                elif dy < 0:
+                    self.rect.top = p.bottom
+                    self.vy = 0
+
+class Player(Entity):
+    __slots__ = ("xp", "coins", "inventory", "armor", "weapon", "shield", "selected", "inv_open",
+                 "throwing", "speed_mult", "jump_mult", "dual", "dagger_bonus", "last_attack",
+                 "block_cd", "anim", "can_double_jump", "invincible_until")
+    def move_armor_to_inventory(self):
+        # Move all equipped armor to first available inventory slots
+        for slot, item in self.armor.items():
+            if item:
+                for i in range(len(self.inventory)):
+                    if self.inventory[i] is None:
+                        self.inventory[i] = item
+                        self.armor[slot] = None
+                        break
+    def to_dict(self):
+        return {
+            'xp': self.xp,
+            'coins': self.coins,
+            'inventory': [item.to_dict() if item else None for item in self.inventory],
+            'armor': {slot: (item.to_dict() if item else None) for slot, item in self.armor.items()},
+        }
+    """
+    The player character, inherits from Entity.
+    """
+    def __init__(self, x, y):
+        """
+        Initialize the player character.
+        """
+        super().__init__(x, y, 40, 60, 100, (255,100,100))
+        self.xp = 0
+        self.coins = 0
+        self.inventory = [None]*10
+        self.armor = {"helmet":None,"chest":None,"legs":None,"boots":None}
+        self.weapon = None
+        self.shield = None
+        self.selected = 0  # inventory index
+        self.inv_open = False
+        self.throwing = None  # rapier projectile
+        self.speed_mult = 1
+        self.jump_mult = 1
+        self.dual = False
+        self.dagger_bonus = 0
+        self.last_attack = 0
+        self.block_cd = 0
+        self.anim = make_anim("player", "idle")
+        self.can_double_jump = True
+        self.invincible_until = 0  # timestamp in ms
+    def from_dict(self, data):
+        self.xp = data.get('xp', 0)
+        self.coins = data.get('coins', 0)
+        inv = data.get('inventory', [None]*10)
+        self.inventory = [Item.from_dict(it) if it else None for it in inv]
+        armor_data = data.get('armor', {})
+        for slot in self.armor:
+            it = armor_data.get(slot)
+            self.armor[slot] = Item.from_dict(it) if it else None
+        self.last_attack = 0
+        self.block_cd = 0
+        self.throwing = None  # rapier projectile
+        self.inv_open = False
+        self.selected = 0  # inventory indexa
+        self.dual = False
+        self.speed_mult = 1
+        self.jump_mult = 1
+        self.dagger_bonus = 0
+        self.calc_set_bonus()
+    def calc_set_bonus(self):
+        """
+        Apply set bonuses for equipped armor.
+        """
+        sets = {}
+        for slot, it in self.armor.items():
+            if it is None:
+                continue
+            prefix = it.name.split()[0]
+            sets[prefix] = sets.get(prefix, 0) + 1
+        self.dual = False
+        self.speed_mult = 1
+        self.jump_mult = 1
+        self.dagger_bonus = 0
+        for pre, c in sets.items():
+            if c == 4:
+                if pre == "ninja":
+                    self.dual = True
+                    self.speed_mult = 1.4
+                    self.jump_mult = 1.3
+                    self.dagger_bonus = 5
+    def attack(self, enemies, now, aim):
+        """
+        Attack enemies with weapon or fist fallback.
+        """
+        if not self.weapon:
+            # Fist fallback attack
+            if now - self.last_attack < FIST_SPEED:
+                return
+            self.last_attack = now
+            ang = angle(self.rect.center, aim)
+            r = FIST_RANGE
+            dmg = FIST_DAMAGE
+            for e in enemies:
+                if dist(self.rect.center, e.rect.center) < r + e.rect.w//2:
+                    e.hp -= dmg
+                    # Instantly max awareness if attacked
+                    e.awareness = 5.0
+                    e.aware = True
+            return
+        if now - self.last_attack < self.weapon.attack_speed:
+            return
+        self.last_attack = now
+        ang = angle(self.rect.center, aim)
+        r = {"dagger":DAGGER_RANGE,"sword":SWORD_RANGE,"rapier":RAPIER_RANGE}[self.weapon.type]
+        EXTRA = 50
+        r += EXTRA
+        hitbox = (self.rect.centerx + math.cos(math.radians(ang))*r,
+                  self.rect.centery + math.sin(math.radians(ang))*r)
+        dmg = self.weapon.dmg
+        # backstab for dagger
+        if self.weapon.type == "dagger":
+            for e in enemies:
+                a = angle(e.rect.center, self.rect.center)
+                diff = (ang - a + 180) % 360 - 180
+                if abs(diff) > BACKSTAB_DEG/2:
+                    # Backstab: deal 1/4th of enemy's current health as bonus damage
+                    dmg += int(e.hp * 0.25)
+        # apply
+        for e in enemies:
+            if dist(self.rect.center, e.rect.center) < r + e.rect.w//2:
+                e.hp -= dmg
+                # Instantly max awareness if attacked
+                e.awareness = 5.0
+                e.aware = True
+    def block(self, now):
+        """
+        Block with a sword if available.
+        """
+        if now - self.block_cd < BLOCK_CD: return False
+        if not self.weapon or self.weapon.type != "sword": return False
+        self.block_cd = now
+        return True
+    def throw_rapier(self, now, aim):
+        """
+        Throw a rapier projectile if equipped.
+        """
+        if not self.weapon or self.weapon.type != "rapier": return
+        if self.throwing: return
+        ang = angle(self.rect.center, aim)
+        self.throwing = rapier_pool.acquire(self.rect.center, ang, self.weapon.dmg*2)
+    def update(self, grid, enemies, now, inp: InputState):
+        """
+        Update player state from the given input and apply physics.
+        """
+        self.vy += GRAVITY
+        # Horizontal movement
+        self.vx = (inp.right - inp.left) * MOVE_SPEED * self.speed_mult
+        # Jumping
+        if inp.jump and self.on_ground:
+            self.vy = JUMP_STR * self.jump_mult
+            self.on_ground = False
+        elif inp.jump and self.can_double_jump and not self.on_ground:
+            self.vy = JUMP_STR * self.jump_mult
+            self.can_double_jump = False
+        self.move(self.vx, self.vy, grid)
+        # Reset double jump if landed
+        if self.on_ground:
+            self.can_double_jump = True
+        # Prevent player from going outside the level boundaries
+        if self.rect.left < 0:
+            self.rect.left = 0
+        if self.rect.right > WIDTH:
+            self.rect.right = WIDTH
+        if self.rect.top < 0:
+            self.rect.top = 0
+        if self.rect.bottom > HEIGHT:
+            self.rect.bottom = HEIGHT
+        if self.throwing:
+            self.throwing.update()
+            if self.throwing.ttl <= 0:
+                rapier_pool.release(self.throwing)
+                self.throwing = None
+                self.anim.update(SIM_DT_MS)
+        # attack
+        if inp.attack:
+            self.attack(enemies, now, inp.aim)
+        # block
+        if inp.ability and self.weapon and self.weapon.type == "sword":
+            self.block(now)
+        if inp.ability and self.weapon and self.weapon.type == "rapier":
+            self.throw_rapier(now, inp.aim)
+    def bounds(self, alpha=1.0):
+        """
+        Screen area the player, its health bar and any thrown rapier cover.
+        """
+        r = self.render_rect(alpha)
+        area = Entity.bounds(self, alpha).union(pg.Rect(r.topleft, self.anim.image().get_size()))
+        if self.throwing:
+            area.union_ip(self.throwing.bounds())
+        return area
+    def draw(self, surf, now, alpha=1.0):
+        """
+        Draw the player and health bar. Show invincibility feedback if active.
+        """
+        rect = self.render_rect(alpha)
+        # Flicker effect for invincibility
+        flicker = now < self.invincible_until and (now // 100) % 2 == 0
+        img = self.anim.image(self.facing < 0, FLICKER_ALPHA if flicker else None)
+        surf.blit(img, rect)
+        self.draw_bar(surf, rect=rect)
+        if self.throwing:
+            self.throwing.draw(surf, alpha)
+
+
+class ThrownRapier:
+    """
+    Represents a thrown rapier projectile. Pooled through `rapier_pool`.
+    """
+    __slots__ = ("x", "y", "ang", "cos_a", "sin_a", "dmg", "ttl", "hit")
+    def __init__(self, pos, ang, dmg):
+        """
+        Initialize the thrown rapier.
+        Args:
+            pos (tuple): Starting position.
+            ang (float): Angle in degrees.
+            dmg (int): Damage value.
+        """
+        self.reset(pos, ang, dmg)
+    def reset(self, pos, ang, dmg):
+        """
+        Launch the rapier again from `pos` (reuses it from `rapier_pool`).
+        """
+        self.x, self.y = pos
+        self.ang = ang
+        self.cos_a, self.sin_a = math.cos(math.radians(ang)), math.sin(math.radians(ang))
+        self.dmg = dmg
+        self.ttl = 90  # simulation ticks (1.5 s)
+        self.hit = False
+    def update(self):
+        """
+        Move the projectile forward.
+        """
+        self.x += self.cos_a * THROWN_RAPIER_SPEED
+        self.y += self.sin_a * THROWN_RAPIER_SPEED
+        self.ttl -= 1
+    def bounds(self):
+        """
+        Screen area covering this tick's and the previous tick's line.
+        """
+        cos_a, sin_a = self.cos_a, self.sin_a
+        xs = (self.x - cos_a*THROWN_RAPIER_SPEED, self.x + cos_a*30)
+        ys = (self.y - sin_a*THROWN_RAPIER_SPEED, self.y + sin_a*30)
+        return pg.Rect(min(xs), min(ys), max(xs)-min(xs), max(ys)-min(ys)).inflate(8, 8)
+    def draw(self, surf, alpha=1.0):
+        """
+        Draw the rapier projectile as a line, interpolated back by (1 - alpha) of a tick.
+        """
+        c = (255,255,255)
+        cos_a, sin_a = self.cos_a, self.sin_a
+        back = (1.0 - alpha) * THROWN_RAPIER_SPEED
+        x, y = self.x - cos_a*back, self.y - sin_a*back
+        end = (x + cos_a*30, y + sin_a*30)
+        pg.draw.line(surf, c, (x, y), end, 4)
+
+rapier_pool: Pool[ThrownRapier] = Pool(ThrownRapier)
+
+# ----------------------------- ENEMY & BOSS --------------------------
+class Enemy(Entity):
+    __slots__ = ("rng", "dmg", "ai_timer", "awareness", "aware", "awareness_timer", "awareness_gain",
+                 "awareness_lose_timer", "last_player_attack", "los_cache", "nav_edge", "_qmark_area")
+    def has_line_of_sight(self, player, grid):
+        """
+        Returns True if there is a clear line of sight between enemy and player (not blocked by platforms).
+        """
+        x1, y1 = self.rect.centerx, self.rect.centery
+        x2, y2 = player.rect.centerx, player.rect.centery
+        for p in grid.near_line((x1, y1), (x2, y2)):
+            if p.clipline((x1, y1), (x2, y2)):
+                return False
+        return True
+    """
+    Enemy character, inherits from Entity.
+    """
+    enemy_sprite = None  # class variable for sprite
+    qmark_img = None  # class variable for question mark image
+    def __init__(self, x, y, hp, dmg, colour, rng=random):
+        """
+        Initialize an enemy. `rng` drives its wandering and jumps (the stage's stream).
+        """
+        super().__init__(x, y, 40, 50, hp, colour)
+        self.reset(x, y, hp, dmg, colour, rng)
+    def reset(self, x, y, hp, dmg, colour, rng=random):
+        """
+        Put the enemy in its freshly spawned state (reuses it from `enemy_pool`).
+        """
+        self.rect.update(x, y, 40, 50)
+        self.prev_x, self.prev_y = x, y
+        self.vx, self.vy = 0, 0
+        self.hp = self.max_hp = hp
+        self.colour = colour
+        self.facing = 1
+        self.on_ground = False
+        self.rng = rng
+        self.dmg = dmg
+        self.ai_timer = 0
+        self.awareness = 0.0  # 0 to 5
+        self.aware = False
+        self.awareness_timer = 0
+        self.awareness_gain = 0.0
+        self.last_player_attack = 0
+        self.awareness_lose_timer = None
+        self.los_cache = None  # last line-of-sight answer (see perception.py)
+        self.nav_edge = None  # navigation move in progress (see navgraph.py)
+        self._qmark_area = None  # where the awareness mark was last drawn
+    def ai(self, player, grid, now, perception=None, nav=None):
+        """
+        Improved AI: enemies avoid walking off ledges and can jump.
+        Line of sight goes through `perception` (cached, budgeted) when given;
+        aware enemies path to the player over `nav` (the stage's NavGraph) when given.
+        """
+        self.ai_timer += 1
+        # Awareness logic
+        if not self.aware:
+            px, py = player.rect.centerx, player.rect.centery
+            ex, ey = self.rect.centerx, self.rect.centery
+            dist = math.hypot(px-ex, py-ey)
+            facing_vec = self.facing
+            player_dir = 1 if px > ex else -1
+            # Line of sight only matters inside the awareness field, so far enemies skip the raycast
+            if dist > 100:
+                los = False
+            elif perception is not None:
+                los = perception.line_of_sight(self, player, grid)
+            else:
+                los = self.has_line_of_sight(player, grid)
+            # Awareness field: reduced to 100px, and must have line of sight
+            if ((player_dir != facing_vec) and (dist > 100 or not los)):
+                self.awareness_gain = 0.0
+                # Start timer for awareness decrease
+                if self.awareness_lose_timer is None:
+                    self.awareness_lose_timer = now
+                elif now - self.awareness_lose_timer > 3000:
+                    self.awareness = max(0.0, self.awareness - 1.0/60.0)  # Lose awareness slowly
+            else:
+                if los and dist < 100:
+                    self.awareness_gain = 1.0/60.0  # 1 per second
+                    self.awareness_lose_timer = None
+                else:
+                    self.awareness_gain = 0.0
+            # If attacked, instantly max awareness
+            if self.last_player_attack and now - self.last_player_attack < 200:
+                self.awareness = 5.0
+            else:
+                self.awareness += self.awareness_gain
+            if self.awareness >= 5.0:
+                self.aware = True
+        if self.aware:
+            self.steer(player, grid, nav)
+        else:
+            self.vx = 0
+    def steer(self, player, grid, nav=None):
+        """
+        Movement of an aware enemy. Follows the navigation graph towards the
+        platform the player is on (or will land on); on the player's platform,
+        or without a route, wanders towards the player without walking off ledges.
+        """
+        if self.nav_edge is not None:
+            if not self.on_ground:
+                # mid jump/drop: keep the take-off velocity until above the target
+                if nav is not None and nav.above_target(self.nav_edge, self.rect):
+                    self.vx = self.nav_edge.direction * 1.5
+                return
+            self.nav_edge = None
+        edge = None
+        if nav is not None and self.on_ground:
+            src = nav.platform_under(self.rect, grid)
+            dst = nav.platform_below(player.rect)
+            if src is not None and dst is not None:
+                edge = nav.route(src, dst)
+        if edge is not None:
+            lead = self.rect.right if edge.direction > 0 else self.rect.left
+            if edge.in_zone(self.rect):
+                self.nav_edge = edge
+                if edge.kind == JUMP:
+                    self.vy = JUMP_STR
+                    self.vx = edge.direction * MOVE_SPEED
+                else:  # walk/drop: carry on over the edge
+                    self.vx = edge.direction * 1.5
+            else:
+                self.vx = 1.5 if lead < edge.zone_min else -1.5
+            return
+        # Ledge awareness: check if next step is a ledge
+        step = int(self.vx/abs(self.vx)) if self.vx != 0 else 0
+        if step != 0 and self.on_ground:
+            test_rect = self.rect.move(step*2, 2)
+            test_rect.y += self.rect.h//2
+            on_platform = test_rect.collidelist(grid.near(test_rect)) != -1
+            if not on_platform:
+                self.vx = 0
+        if self.ai_timer % 60 == 0:
+            self.vx = self.rng.choice([-1,0,1])
+        if self.rect.centerx < player.rect.centerx: self.vx += 0.05
+        else: self.vx -= 0.05
+        self.vx = max(-1.5, min(1.5, self.vx))
+        if self.rng.random() < 0.005 and self.on_ground:
+            self.vy = -8
+    def update(self, player, grid, now, perception=None, nav=None):
+        """
+        Update enemy state, handle collisions, and apply fall damage.
+        """
+        with profiler.section("enemy.ai"):
+            self.ai(player, grid, now, perception, nav)
+        self.vy += GRAVITY
+        prev_vy = self.vy
+        prev_on_ground = self.on_ground
+        self.move(self.vx, self.vy, grid)
+        # Fall damage: if just landed and was falling fast
+        if not prev_on_ground and self.on_ground and prev_vy > 10:
+            self.hp -= int((prev_vy-10)*2)
+        # Only damage player if enemy is alive and player is alive
+        if self.hp > 0 and player.hp > 0 and self.rect.colliderect(player.rect):
+            if now >= getattr(player, 'invincible_until', 0):
+                self.awareness = 5.0
+                self.aware = True
+                player.hp -= self.dmg
+                self.rect.x += sign(self.rect.centerx - player.rect.centerx) * 30
+    def draw(self, surf, alpha=1.0):
+        """
+        Draw the enemy and health bar.
+        """
+        rect = self.render_rect(alpha)
+        self._qmark_area = None
+        if Enemy.enemy_sprite is None:
+            Enemy.enemy_sprite = load_image("assets/rock-monster.png")
+        if Enemy.qmark_img is None:
+            Enemy.qmark_img = load_image("assets/qmark.png")
+        if type(self).enemy_sprite:
+            img = scaled(type(self).enemy_sprite, (rect.w, rect.h))
+            surf.blit(img, rect)
+        else:
+            pg.draw.rect(surf, self.colour, rect)
+        # Awareness indicator: only show if currently gaining awareness
+        if not self.aware and self.awareness_gain > 0 and Enemy.qmark_img:
+            # Awareness fill: darken qmark from bottom up
+            # Scale qmark to enemy width (max 1.2x width, keep aspect)
+            scale_w = min(int(rect.w * 1.2), Enemy.qmark_img.get_width()*2)
+            scale_h = int(scale_w * Enemy.qmark_img.get_height() / Enemy.qmark_img.get_width())
+            qmark = scaled(Enemy.qmark_img, (scale_w, scale_h), smooth=True)
+            fill = min(1.0, self.awareness/5.0)
+            h = qmark.get_height()
+            qx, qy = rect.centerx - qmark.get_width()//2, rect.top - h - 8
+            surf.blit(qmark, (qx, qy))
+            self._qmark_area = pg.Rect(qx, qy, qmark.get_width(), h)
+            if int(h*fill) > 0:
+                darken = sprite_cache.solid((qmark.get_width(), int(h*fill)), (0,0,0,120))
+                surf.blit(darken, (qx, qy + h-int(h*fill)))
+        self.draw_bar(surf, rect=rect)
+
+    def bounds(self, alpha=1.0):
+        """
+        Screen area of the enemy, its health bar and (if shown) the awareness mark.
+        """
+        area = Entity.bounds(self, alpha)
+        if self._qmark_area:
+            area.union_ip(self._qmark_area)
+        return area
+
+enemy_pool: Pool[Enemy] = Pool(Enemy)
+
+class Boss(Enemy):
+    """
+    Boss enemy, inherits from Enemy.
+    """
+    __slots__ = ()
+    boss_sprite = None  # class variable for boss sprite
+    def __init__(self, x, y, rng=random):
+        """
+        Initialize the boss enemy.
+        """
+        super().__init__(x, y, 300, 15, (150,50,255), rng)
+        self.rect.w, self.rect.h = 60, 80
+
+    def draw(self, surf, alpha=1.0):
+        """
+        Draw the boss and health bar.
+        """
+        rect = self.render_rect(alpha)
+        # Load boss sprite once
+        if Boss.boss_sprite is None:
+            Boss.boss_sprite = load_image("assets/rock-boss.png")
+        if type(self).boss_sprite:
+            img = scaled(type(self).boss_sprite, (rect.w, rect.h))
+            surf.blit(img, rect)
+        else:
+            pg.draw.rect(surf, self.colour, rect)
+        self.draw_bar(surf, rect=rect)
+
+# --- Portal Animation Helper ---
+def load_portal_frames(filename, frame_w, frame_h):
+    """
+    Load a 3x2 spritesheet and return a list of 6 frames.
+    Falls back to the whole image as a single frame if the sheet is too small.
+    """
+    sheet = load_image(filename)
+    if sheet is None:
+        return []
+    if sheet.get_width() < 3*frame_w or sheet.get_height() < 2*frame_h:
+        return [sheet]
+    frames = []
+    for row in range(2):
+        for col in range(3):
+            rect = pg.Rect(col*frame_w, row*frame_h, frame_w, frame_h)
+            frame = sheet.subsurface(rect).copy()
+            frames.append(frame)
+    return frames
+
+# Example Portal class
+class Portal:
+    FRAME_COUNT = 6
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.rect = pg.Rect(x, y, 64, 64)  # Change 64 to your frame size
+        self.frames = None  # loaded on first draw
+        self.frame_idx = 0
+        self.anim_timer = 0
+        self.anim_speed = 100  # ms per frame
+
+    def update(self, dt):
+        self.anim_timer += dt
+        if self.anim_timer > self.anim_speed:
+            self.anim_timer = 0
+            self.frame_idx = (self.frame_idx + 1) % Portal.FRAME_COUNT
+
+    def draw(self, surf):
+        if self.frames is None:
+            self.frames = load_portal_frames("assets/portal.png", frame_w=self.rect.w, frame_h=self.rect.h)
+        if not self.frames:
+            pg.draw.ellipse(surf, (120,60,255), self.rect)
+            return
+        frame = self.frames[self.frame_idx % len(self.frames)]
+        surf.blit(frame, (self.x, self.y))
+
+class Stage:
+    """
+    Represents a game level (stage).
+    """
+    def __init__(self, num, rng=None):
+        """
+        Initialize the stage with platforms, mobs, and drops.
+        Args:
+            num (int): Stage number.
+            rng (random.Random): The run's random stream; layout, spawns, loot and
+                enemy AI all draw from it so a seed reproduces the stage exactly.
+        """
+        self.num = num
+        self.rng = rng if rng is not None else random.Random()
+        self.platforms = self.make_platforms()
+        self.grid = PlatformGrid(self.platforms)  # static broad phase, built once per stage
+        self.perception = Perception()  # enemies' cached, budgeted line-of-sight queries
+        self._nav = None  # platform navigation graph, built on first use
+        self._static_layer = None  # background + ground + platforms, baked on first draw
+        self.mobs: List[Enemy] = []
+        self.drops: List[Drop] = []
+        self.portal = None  # Will be a Portal object
+        self.boss_dead = False
+        self.spawn_initial_mobs()
+    def make_platforms(self):
+        """
+        Generate at least 6 platforms (excluding ground), each within max jump height and distance from the previous, with some randomization.
+        """
+        ground_height = 100
+        base = [pg.Rect(0, HEIGHT - ground_height, WIDTH, ground_height)]
+        min_platforms = 6
+        max_jump = PLATFORM_MAX_JUMP
+        max_dx = PLATFORM_MAX_DX
+        min_dx = 80     # Min horizontal distance for variety
+        min_dy = 80     # Min vertical gap for variety
+        max_dy = max_jump
+        min_dist = 60   # Minimum distance between any two platforms (horizontal or vertical)
+        platforms = []
+        prev_rect = base[0]
+        y = HEIGHT - ground_height - self.rng.randint(min_dy, max_dy)
+        for i in range(min_platforms):
+            tries = 0
+            while True:
+                w = self.rng.randint(150, 300)
+                dx = self.rng.randint(min_dx, max_dx)
+                if prev_rect.x < WIDTH // 2:
+                    x = min(prev_rect.x + dx, WIDTH - w - 20)
+                else:
+                    x = max(prev_rect.x - dx, 20)
+                y = max(y, 60)
+                rect = pg.Rect(x, y, w, 20)
+                # Check for overlap/too close to any previous platform
+                too_close = False
+                for p in platforms:
+                    if abs(rect.y - p.y) < min_dy//2 and (rect.right > p.x and rect.x < p.right):
+                        too_close = True
+                        break
+                    if abs(rect.x - p.x) < min_dist and abs(rect.y - p.y) < min_dist:
+                        too_close = True
+                        break
+                if not too_close or tries > 10:
+                    break
+                tries += 1
+                y -= 10  # try a bit higher if stuck
+            platforms.append(rect)
+            prev_rect = rect
+            y -= self.rng.randint(min_dy, max_dy)
+        # Optionally add a few more random platforms for density, but enforce spacing
+        extra = self.rng.randint(0, 3)
+        for _ in range(extra):
+            tries = 0
+            while True:
+                px = self.rng.randint(40, WIDTH-340)
+                py = self.rng.randint(60, HEIGHT-200)
+                pw = self.rng.randint(120, 260)
+                rect = pg.Rect(px, py, pw, 20)
+                too_close = False
+                for p in platforms:
+                    if abs(rect.y - p.y) < min_dy//2 and (rect.right > p.x and rect.x < p.right):
+                        too_close = True
+                        break
+                    if abs(rect.x - p.x) < min_dist and abs(rect.y - p.y) < min_dist:
+                        too_close = True
+                        break
+                if not too_close or tries > 10:
+                    break
+                tries += 1
+        
+            platforms.append(rect)
+        # Always include ground
+        all_platforms = base + platforms
+        all_platforms.sort(key=lambda r: r.y)
+        return all_platforms
+    def spawn_initial_mobs(self):
+        """
+        Spawn the initial set of enemies for the stage.
+        """
+        for i in range(10):
+            x = self.rng.randint(100, WIDTH-100)
+            y = 100
+            self.mobs.append(enemy_pool.acquire(x, y, 40 + self.num*10, 5 + self.num*2, (200,200,50), self.rng))
+    def spawn_boss(self):
+        """
+        Spawn the boss enemy for the stage.
+        """
+        self.mobs.append(Boss(WIDTH//2, 150, self.rng))
+    def update(self, player):
+        """
+        Update mobs, drops, and portal state for the stage.
+        """
+        # drop loot
+        mobs = self.mobs
+        i = 0
+        while i < len(mobs):
+            m = mobs[i]
+            if m.hp > 0:
+                i += 1
+            else:
+                swap_remove(mobs, i)
+                player.xp += 5 + self.num*3
+                # chance drop
+                drop_item = None
+                if isinstance(m, Boss):
+                    drop_item = random_weapon("godlike", self.rng)
+                    self.boss_dead = True
+                elif self.rng.random() < 0.3:
+                    if self.rng.random() < 0.5:
+                        drop_item = random_weapon(rng=self.rng)
+                    else:
+                        drop_item = random_armour_piece(self.rng.choice(["helmet","chest","legs","boots"]), rng=self.rng)
+                if drop_item:
+                    self.drops.append(drop_pool.acquire(drop_item, m.rect.centerx, m.rect.centery))
+                if type(m) is Enemy:
+                    enemy_pool.release(m)
+
+        # Boss spawns only after all regular enemies (and no boss yet) are gone
+        if not self.boss_dead and not mobs:
+            self.spawn_boss()
+        # portal
+        if self.boss_dead and not self.portal:
+            self.portal = Portal(WIDTH-100, HEIGHT-164)  # standing on the ground
+        if self.portal:
+            self.portal.update(SIM_DT_MS)  # Update animation (dt in ms)
+    def release(self):
+        """
+        Hand the stage's remaining enemies and drops back to their pools when
+        the stage is left. The stage must not be updated or drawn afterwards.
+        """
+        for m in self.mobs:
+            if type(m) is Enemy:
+                enemy_pool.release(m)
+        for d in self.drops:
+            d.item = None
+            drop_pool.release(d)
+        self.mobs = []
+        self.drops = []
+    def set_platforms(self, platforms):
+        """
+        Replace the stage geometry: rebuilds the collision grid and drops the baked layer.
+        """
+        self.platforms = platforms
+        self.grid = PlatformGrid(platforms)
+        self._nav = None
+        self.invalidate_static_layer()
+    @property
+    def nav(self):
+        """
+        The stage's NavGraph: walk/jump/drop edges between platforms for enemy pathfinding.
+        """
+        if self._nav is None:
+            self._nav = NavGraph(self.platforms, GRAVITY, -JUMP_STR, MOVE_SPEED,
+                                 PLATFORM_MAX_JUMP, PLATFORM_MAX_DX)
+        return self._nav
+    def invalidate_static_layer(self):
+        """
+        Forget the baked static layer; it is rebuilt on the next draw.
+        """
+        self._static_layer = None
+    def static_layer(self):
+        """
+        Return the background, ground tiles and platforms composed into one surface.
+        Built once per stage (nothing in it changes while the stage is alive).
+        """
+        if self._static_layer is not None:
+            return self._static_layer
+        layer = pg.Surface((WIDTH, HEIGHT))
+        if pg.display.get_surface() is not None:
+            layer = layer.convert()
+        bg = load_image("assets/background.png", alpha=False)
+        if bg:
+            layer.blit(pg.transform.scale(bg, (WIDTH, HEIGHT)), (0, 0))
+        else:
+            layer.fill((30,30,40))
+        floor_img = load_image("assets/floor.png")
+        for i, p in enumerate(self.platforms):
+            if floor_img:
+                if i == 0:
+                    # Ground: tile the image, only draw full tiles (no stretching, no cropping)
+                    tile_w, tile_h = floor_img.get_width(), floor_img.get_height()
+                    x_start = p.x
+                    y_start = p.y
+                    x_end = p.x + p.w
+                    y_end = p.y + p.h
+                    for x in range(x_start, x_end, tile_w):
+                        for y in range(y_start, y_end, tile_h):
+                            if x + tile_w <= x_end and y + tile_h <= y_end:
+                                layer.blit(floor_img, (x, y))
+                    # Optionally, fill the right/bottom edge with color if you want no gaps
+                else:
+                    # Platforms: stretch the image
+                    layer.blit(pg.transform.scale(floor_img, (p.w, p.h)), (p.x, p.y))
+            else:
+                pg.draw.rect(layer, (100,100,120), p)
+        self._static_layer = layer
+        return layer
+    def dirty_rects(self, alpha=1.0):
+        """
+        Screen areas covered by everything drawn on top of the static layer.
+        """
+        rects = [pg.Rect(d.x, d.y, 30, 30) for d in self.drops]
+        if self.portal:
+            rects.append(self.portal.rect.copy())
+        rects.extend(m.bounds(alpha) for m in self.mobs)
+        return rects
+    def draw(self, surf, alpha=1.0, static=True):
+        """
+        Draw the stage: the baked static layer (background, ground, platforms),
+        then drops, portal and enemies. alpha interpolates moving entities
+        between the last two ticks. static=False skips the layer blit (the caller
+        has already restored the background where needed).
+        """
+        if static:
+            surf.blit(self.static_layer(), (0, 0))
+        for d in self.drops:
+            d.draw(surf)
+        if self.portal:
+            self.portal.draw(surf)
+        # Draw all enemies on top
+        for m in self.mobs:
+            m.draw(surf, alpha)
+
+# ----------------------------- GAME SESSION ----------------------------
+class GameSession:
+    """
+    The simulation state of one run: player, current stage and stage progression.
+    `tick` is everything `run_game` does per frame apart from events and drawing,
+    so it can be driven headless.
+    """
+    def __init__(self, player, now=0, stage_num=1, seed=None):
+        """
+        Start a run on the given stage with full health and spawn invincibility.
+        `now` is the simulation clock in ms; it advances by SIM_DT_MS per tick.
+        Every random decision of the run comes from one stream seeded with `seed`
+        (a fresh seed is picked if None), so seed + per-tick inputs replay it exactly.
+        """
+        self.player = player
+        self.stage_num = stage_num
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.stage = Stage(stage_num, self.rng)
+        self.horde = EnemyStore(GRAVITY) if HAVE_NUMPY else None
+        self.game_over = False
+        self.now = now
+        player.hp = player.max_hp
+        player.invincible_until = now + 3000  # 3 seconds invincibility at spawn
+    def pick_up(self):
+        """
+        Pick up the first drop within range into the first empty inventory slot.
+        """
+        player = self.player
+        drops = self.stage.drops
+        pickup_range = 60
+        for j, drop in enumerate(drops):
+            if dist(player.rect.center, (drop.x, drop.y)) < pickup_range:
+                # Find first empty inventory slot
+                for i in range(len(player.inventory)):
+                    if player.inventory[i] is None:
+                        player.inventory[i] = drop.item
+                        swap_remove(drops, j)
+                        drop.item = None
+                        drop_pool.release(drop)
+                        break
+                break
+    def next_stage(self):
+        """
+        Advance to the next stage and reset the player to the spawn point.
+        """
+        self.stage_num += 1
+        self.stage.release()
+        self.stage = Stage(self.stage_num, self.rng)
+        player = self.player
+        player.rect.x, player.rect.y = 100, HEIGHT-200
+        player.snapshot()  # don't interpolate across the teleport
+        player.hp = player.max_hp
+        player.invincible_until = self.now + 2000
+    def tick(self, inp: InputState):
+        """
+        Advance the simulation by one fixed step (SIM_DT_MS) using the given input.
+        """
+        if self.game_over:
+            return
+        self.now += SIM_DT_MS
+        now = self.now
+        player, stage = self.player, self.stage
+        stage.perception.begin_tick()
+        player.snapshot()
+        for mob in stage.mobs:
+            mob.snapshot()
+        if inp.pickup:
+            self.pick_up()
+        with profiler.section("player.update"):
+            player.update(stage.grid, stage.mobs, now, inp)
+        with profiler.section("stage.update"):
+            stage.update(player)
+        nav = stage.nav
+        if self.horde is not None and len(stage.mobs) >= HORDE_MIN_MOBS:
+            with profiler.section("horde.update"):
+                self.horde.update(stage.mobs, player, stage.grid, now, stage.perception, nav)
+        else:
+            for mob in stage.mobs:
+                with profiler.section("enemy.update"):
+                    mob.update(player, stage.grid, now, stage.perception, nav)
+        # Check for player death
+        if player.hp <= 0:
+            player.move_armor_to_inventory()
+            self.game_over = True
+            return
+        # Portal to next level
+        if stage.portal and player.rect.colliderect(stage.portal.rect):
+            self.next_stage()
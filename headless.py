@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Headless runner for the simulation core.
+
+Steps the same per-frame logic as `run_game` (player, stage, enemies, stage
+progression) without opening a window or calling `present()`, so stages can be
+soak-tested on machines with no display and tick cost measured on its own.
+
+    python3 headless.py --stages 1000 --ticks 600 --seed 1
+    python3 headless.py --stages 1 --seed 1 --record run.rpl
+    python3 headless.py --replay run.rpl
+"""
+import argparse
+import random
+import time
+
+from game_core import HEIGHT, InputState, Player, GameSession
+from replay import InputRecorder, Replay, play_replay
+
+
+def bot_input(rng, session, tick):
+    """
+    A wandering bot: changes direction every half second, jumps now and then
+    and swings at the nearest enemy. Enough to exercise movement and combat.
+    """
+    player, stage = session.player, session.stage
+    if tick % 30 == 0:
+        session.bot_dir = rng.choice([-1, 0, 1])
+    direction = getattr(session, "bot_dir", 0)
+    aim = player.rect.center
+    if stage.mobs:
+        aim = min(stage.mobs, key=lambda m: abs(m.rect.centerx - player.rect.centerx)).rect.center
+    return InputState(
+        left=direction < 0,
+        right=direction > 0,
+        jump=rng.random() < 0.05,
+        attack=True,
+        pickup=tick % 20 == 0,
+        aim=aim,
+    )
+
+
+def run_headless(stages=100, ticks=600, seed=None, bot=True, record=None):
+    """
+    Simulate `stages` fresh runs of up to `ticks` ticks each and return timing stats.
+    A run ends early if the player dies. Each run gets its own session seed drawn
+    from `seed`, so the whole batch is reproducible. With `record`, the inputs of
+    the last run are written there as a replay.
+    """
+    rng = random.Random(seed)
+    idle = InputState()
+    total_ticks = 0
+    deaths = 0
+    start = time.perf_counter()
+    for _ in range(stages):
+        session = GameSession(Player(100, HEIGHT-200), seed=rng.getrandbits(32))
+        recorder = InputRecorder(session) if record else None
+        for t in range(ticks):
+            inp = bot_input(rng, session, t) if bot else idle
+            session.tick(inp)
+            if recorder:
+                recorder.record(inp, session)
+            total_ticks += 1
+            if session.game_over:
+                deaths += 1
+                break
+    elapsed = time.perf_counter() - start
+    if record:
+        recorder.save(record)
+    return {
+        "stages": stages,
+        "ticks": total_ticks,
+        "deaths": deaths,
+        "seconds": elapsed,
+        "ticks_per_sec": total_ticks / elapsed if elapsed else 0.0,
+    }
+
+
+def run_replay(path, verify=True):
+    """
+    Replay a recording as fast as possible and return timing and sync stats.
+    """
+    replay = Replay.load(path)
+    start = time.perf_counter()
+    session, desync = play_replay(replay, verify)
+    elapsed = time.perf_counter() - start
+    return {
+        "ticks": len(replay.inputs),
+        "seconds": elapsed,
+        "ticks_per_sec": len(replay.inputs) / elapsed if elapsed else 0.0,
+        "stage": session.stage_num,
+        "game_over": session.game_over,
+        "desync": desync,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the game simulation without a window.")
+    parser.add_argument("--stages", type=int, default=100, help="number of fresh stages to simulate")
+    parser.add_argument("--ticks", type=int, default=600, help="max ticks per stage (60 ticks = 1 s)")
+    parser.add_argument("--seed", type=int, default=None, help="RNG seed")
+    parser.add_argument("--idle", action="store_true", help="no bot input, just let enemies run")
+    parser.add_argument("--record", default=None, help="write the last run's inputs to this replay file")
+    parser.add_argument("--replay", default=None, help="replay a recording instead of running the bot")
+    args = parser.parse_args()
+    if args.replay:
+        stats = run_replay(args.replay)
+        sync = "in sync" if stats["desync"] is None else f"DESYNC at tick {stats['desync']}"
+        print(f"replayed {stats['ticks']} ticks in {stats['seconds']:.2f}s "
+              f"({stats['ticks_per_sec']:.0f} ticks/s, stage {stats['stage']}, {sync})")
+        raise SystemExit(0 if stats["desync"] is None else 1)
+    stats = run_headless(args.stages, args.ticks, args.seed, bot=not args.idle, record=args.record)
+    print(f"{stats['stages']} stages, {stats['ticks']} ticks in {stats['seconds']:.2f}s "
+          f"({stats['ticks_per_sec']:.0f} ticks/s, {stats['deaths']} deaths)")
@@ -0,0 +1,209 @@
+"""
+Batched enemy update for horde stages (optional, needs NumPy).
+
+`Enemy.update` runs one mob at a time with Python attribute access for the
+awareness maths, gravity, platform collisions and contact checks. With hundreds
+of mobs that dominates the tick. `EnemyStore` loads the mobs' state into
+struct-of-arrays NumPy buffers once per tick, runs the whole `Enemy.ai` +
+`Enemy.update` step as array operations, and writes the results back to the
+Enemy objects. The objects stay the source of truth for drawing, combat and the
+stage, so nothing else has to know which path ran.
+
+The batch is exact, not an approximation. It is the same tick as calling
+`mob.update()` for each mob in list order:
+- Integer maths is kept integer, and distances are compared squared.
+- Float-to-Rect conversion reproduces pygame's rounding.
+- Platforms are resolved in stage order over the same grid cells.
+- The only order-dependent parts stay sequential, in list order: steering of
+  aware mobs (`Enemy.steer`, which draws from the RNG) and contact damage to
+  the player.
+
+Line of sight is still asked per mob, only for unaware mobs within awareness
+range (the only ones whose result is used), through the stage's Perception.
+Unaware mobs stand still, so only aware ones are steered.
+
+Without NumPy, `HAVE_NUMPY` is False and callers use the per-object loop.
+"""
+from itertools import chain
+from operator import attrgetter
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:  # optional dependency
+    np = None
+    HAVE_NUMPY = False
+
+AWARE_RANGE_SQ = 100 * 100  # awareness field radius (px), squared
+
+# one C-level call per mob instead of an attribute lookup per field
+_rect_fields = attrgetter("rect.x", "rect.y", "rect.w", "rect.h")
+_state_fields = attrgetter("vx", "vy", "on_ground", "facing", "aware", "awareness",
+                           "awareness_gain", "last_player_attack")
+
+
+def _rect_round(v):
+    """
+    pygame's conversion of a float coordinate assigned to a Rect attribute:
+    round half away from zero (C `round`).
+    """
+    t = np.trunc(v)
+    return (t + np.sign(v) * (np.abs(v - t) >= 0.5)).astype(np.int64)
+
+
+class EnemyStore:
+    """
+    Struct-of-arrays view of a list of enemies for one batched tick.
+    """
+    def __init__(self, gravity):
+        """
+        Args:
+            gravity (float): Per-tick vertical acceleration (game_core.GRAVITY).
+        """
+        self.gravity = gravity
+        self._grid = None
+        self._plat = None
+
+    def _platform_arrays(self, grid):
+        # platform edges and grid cell ranges, rebuilt only when the stage changes
+        if self._grid is not grid:
+            c = grid.cell
+            ps = list(grid)
+            left = np.array([p.left for p in ps], dtype=np.int64)
+            top = np.array([p.top for p in ps], dtype=np.int64)
+            right = np.array([p.right for p in ps], dtype=np.int64)
+            bottom = np.array([p.bottom for p in ps], dtype=np.int64)
+            self._plat = (left, top, right, bottom,
+                          left // c, (right - 1) // c, top // c, (bottom - 1) // c)
+            self._grid = grid
+        return self._plat
+
+    def load(self, mobs):
+        """
+        Gather the mobs' state into arrays.
+        """
+        n = len(mobs)
+        rects = np.fromiter(chain.from_iterable(map(_rect_fields, mobs)), np.int64, 4 * n).reshape(n, 4)
+        self.x, self.y, self.w, self.h = rects.T.copy()
+        state = np.fromiter(chain.from_iterable(map(_state_fields, mobs)), np.float64, 8 * n).reshape(n, 8)
+        (self.vx, self.vy, on_ground, self.facing, aware, self.awareness,
+         self.gain, self.last_attack) = state.T.copy()
+        self.on_ground = on_ground.astype(bool)
+        self.aware = aware.astype(bool)
+        self.ai_timer = np.array([m.ai_timer for m in mobs], dtype=np.int64)
+        lose = [m.awareness_lose_timer for m in mobs]
+        self.lose_timer = np.array([np.nan if t is None else t for t in lose], dtype=np.float64)
+
+    def store(self, mobs):
+        """
+        Write the arrays back to the mobs (as plain Python numbers).
+        """
+        for m, x, y, vx, vy, on_ground, aware, awareness, gain, timer, lt in zip(
+                mobs, self.x.tolist(), self.y.tolist(), self.vx.tolist(), self.vy.tolist(),
+                self.on_ground.tolist(), self.aware.tolist(), self.awareness.tolist(),
+                self.gain.tolist(), self.ai_timer.tolist(), self.lose_timer.tolist()):
+            m.rect.topleft = (x, y)
+            m.vx, m.vy = vx, vy
+            m.on_ground = on_ground
+            m.aware = aware
+            m.awareness = awareness
+            m.awareness_gain = gain
+            m.ai_timer = timer
+            m.awareness_lose_timer = None if lt != lt else lt  # NaN -> None
+
+    def update(self, mobs, player, grid, now, perception=None, nav=None):
+        """
+        Run one `Enemy.update` for every mob in `mobs`, batched.
+        """
+        if not mobs:
+            return
+        self.load(mobs)
+        self._ai(mobs, player, grid, now, perception, nav)
+        # gravity, then Entity.move
+        self.vy += self.gravity
+        prev_vy = self.vy.copy()
+        prev_on_ground = self.on_ground.copy()
+        self._move(grid)
+        # fall damage (rare; hp stays a plain attribute)
+        hurt = ~prev_on_ground & self.on_ground & (prev_vy > 10)
+        for i in np.flatnonzero(hurt).tolist():
+            mobs[i].hp -= int((prev_vy[i] - 10) * 2)
+        # contact damage: sequential, each hit lowers player.hp for the next mob
+        pr = player.rect
+        touching = (self.x < pr.right) & (pr.x < self.x + self.w) & (self.y < pr.bottom) & (pr.y < self.y + self.h)
+        self.store(mobs)
+        if touching.any() and now >= getattr(player, 'invincible_until', 0):
+            for i in np.flatnonzero(touching).tolist():
+                m = mobs[i]
+                if m.hp > 0 and player.hp > 0:
+                    m.awareness = 5.0
+                    m.aware = True
+                    player.hp -= m.dmg
+                    m.rect.x += (1 if m.rect.centerx > pr.centerx else -1 if m.rect.centerx < pr.centerx else 0) * 30
+
+    def _ai(self, mobs, player, grid, now, perception, nav):
+        # Enemy.ai for every mob
+        self.ai_timer += 1
+        px, py = player.rect.centerx, player.rect.centery
+        ex = self.x + self.w // 2
+        ey = self.y + self.h // 2
+        d2 = (px - ex) ** 2 + (py - ey) ** 2
+        unaware = ~self.aware
+        # line of sight only matters inside the awareness field
+        los = np.zeros(len(mobs), dtype=bool)
+        for i in np.flatnonzero(unaware & (d2 <= AWARE_RANGE_SQ)).tolist():
+            if perception is not None:
+                los[i] = perception.line_of_sight(mobs[i], player, grid)
+            else:
+                los[i] = mobs[i].has_line_of_sight(player, grid)
+        player_dir = np.where(px > ex, 1, -1)
+        losing = unaware & (player_dir != self.facing) & ((d2 > AWARE_RANGE_SQ) | ~los)
+        gaining = unaware & ~losing & los & (d2 < AWARE_RANGE_SQ)
+        self.gain[unaware] = 0.0
+        self.gain[gaining] = 1.0 / 60.0
+        no_timer = np.isnan(self.lose_timer)
+        decay = losing & ~no_timer & (now - np.where(no_timer, now, self.lose_timer) > 3000)
+        self.lose_timer[losing & no_timer] = now
+        self.lose_timer[gaining] = np.nan
+        self.awareness[decay] = np.maximum(0.0, self.awareness[decay] - 1.0 / 60.0)
+        attacked = unaware & (self.last_attack != 0) & (now - self.last_attack < 200)
+        self.awareness[attacked] = 5.0
+        rest = unaware & ~attacked
+        self.awareness[rest] += self.gain[rest]
+        self.aware |= unaware & (self.awareness >= 5.0)
+        # aware mobs steer through Enemy.steer itself (navigation graph lookups and
+        # RNG draws), in list order; their position and velocity are unchanged so far
+        for i in np.flatnonzero(self.aware).tolist():
+            m = mobs[i]
+            m.ai_timer = int(self.ai_timer[i])
+            m.steer(player, grid, nav)
+            self.vx[i], self.vy[i] = m.vx, m.vy
+        self.vx[~self.aware] = 0.0
+
+    def _move(self, grid):
+        # Entity.move(vx, vy, grid) for every mob
+        left, top, right, bottom, cx0, cx1, cy0, cy1 = self._platform_arrays(grid)
+        c = grid.cell
+        x, y, w, h, dx, dy = self.x, self.y, self.w, self.h, self.vx, self.vy
+        # swept query rect as Entity.move builds it (Rect.move truncates floats)
+        mx, my = x + np.trunc(dx).astype(np.int64), y + np.trunc(dy).astype(np.int64)
+        sl, st = np.minimum(x, mx) - 1, np.minimum(y, my) - 1
+        sr, sb = np.maximum(x, mx) + w + 1, np.maximum(y, my) + h + 1
+        near = ((sl // c)[:, None] <= cx1) & (cx0 <= (sr // c)[:, None]) & \
+               ((st // c)[:, None] <= cy1) & (cy0 <= (sb // c)[:, None])
+        x = _rect_round(x + dx)
+        for j in range(len(left)):
+            hit = near[:, j] & (x < right[j]) & (left[j] < x + w) & (y < bottom[j]) & (top[j] < y + h)
+            if hit.any():
+                x = np.where(hit & (dx > 0), left[j] - w, np.where(hit & (dx < 0), right[j], x))
+        y = _rect_round(y + dy)
+        on_ground = np.zeros(len(x), dtype=bool)
+        vy = self.vy.copy()
+        for j in range(len(left)):
+            hit = near[:, j] & (x < right[j]) & (left[j] < x + w) & (y < bottom[j]) & (top[j] < y + h)
+            if hit.any():
+                down, up = hit & (dy > 0), hit & (dy < 0)
+                y = np.where(down, top[j] - h, np.where(up, bottom[j], y))
+                on_ground |= down
+                vy[down | up] = 0.0
+        self.x, self.y, self.vy, self.on_ground = x, y, vy, on_ground
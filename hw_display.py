@@ -0,0 +1,124 @@
+"""
+Hardware presentation of the logical screen (optional, needs pygame._sdl2).
+
+The software path in `present()` rescales the whole 1200×700 logical surface
+on the CPU every frame (`pg.transform.scale` / `smoothscale`) and blits the
+result to the window. A `TextureDisplay` instead owns an SDL window with a 2D
+renderer. Each frame it copies the logical surface into a streaming texture
+(only the dirty rects when dirty-rect rendering is on) and lets the renderer
+scale and letterbox it on the GPU. CPU cost no longer grows with the window
+size.
+
+The game still composes frames into the logical surface with ordinary blits.
+Only upload and scaling move to the renderer, so nothing else has to know which
+path is presenting.
+
+The window can't also have a `pg.display.set_mode` surface. While a
+TextureDisplay is in use, `pg.display.get_surface()` is None and images stay in
+their loaded pixel format.
+
+Without pygame._sdl2, or if SDL can't create a renderer, `create` returns None
+and the caller keeps the software window.
+"""
+import os
+
+import pygame as pg
+
+try:
+    from pygame._sdl2.video import Renderer, Texture, Window
+    HAVE_SDL2_VIDEO = True
+except ImportError:  # optional: older pygame or a build without _sdl2
+    Renderer = Texture = Window = None
+    HAVE_SDL2_VIDEO = False
+
+
+class TextureDisplay:
+    """
+    SDL window + renderer standing in for the display surface. Offers the parts
+    of the window surface API the game uses (`get_size` and friends) plus
+    `set_mode` for fullscreen / borderless switches.
+    """
+    def __init__(self, title, size, flags=0):
+        """
+        Args:
+            title (str): Window title.
+            size (tuple): Window size in pixels.
+            flags (int): pg.RESIZABLE / pg.NOFRAME / pg.FULLSCREEN, as for set_mode.
+        """
+        self.window = Window(title, size, resizable=bool(flags & pg.RESIZABLE),
+                             borderless=bool(flags & pg.NOFRAME),
+                             fullscreen_desktop=bool(flags & pg.FULLSCREEN))
+        self.renderer = Renderer(self.window)
+        # SDL fixes a texture's filtering when it is created: one texture per mode
+        self._textures = {}
+        self._current = None  # texture holding the last presented frame
+
+    @classmethod
+    def create(cls, title, size, flags=0):
+        """
+        Open a TextureDisplay, or return None (and log) if that isn't possible.
+        """
+        if not HAVE_SDL2_VIDEO:
+            print("Hardware renderer unavailable (no pygame._sdl2), using software scaling")
+            return None
+        try:
+            return cls(title, size, flags)
+        except Exception as e:
+            print("Failed to create hardware renderer, using software scaling:", e)
+            return None
+
+    def get_size(self):
+        return self.window.size
+
+    def get_width(self):
+        return self.window.size[0]
+
+    def get_height(self):
+        return self.window.size[1]
+
+    def set_mode(self, size, flags=0):
+        """
+        Switch fullscreen / borderless / size like pg.display.set_mode.
+        A (0, 0) size keeps the current window size.
+        """
+        if flags & pg.FULLSCREEN:
+            self.window.set_fullscreen(desktop=True)
+        else:
+            self.window.set_windowed()
+            self.window.resizable = bool(flags & pg.RESIZABLE)
+            self.window.borderless = bool(flags & pg.NOFRAME)
+            if size != (0, 0):
+                self.window.size = size
+        return self
+
+    def _texture(self, size, smooth):
+        key = (size, smooth)
+        tex = self._textures.get(key)
+        if tex is None:
+            os.environ["SDL_RENDER_SCALE_QUALITY"] = "linear" if smooth else "nearest"
+            tex = Texture(self.renderer, size, streaming=True)
+            self._textures[key] = tex
+        return tex
+
+    def present(self, surf, dst, smooth, areas=None):
+        """
+        Show `surf` scaled into the window rect `dst`, black around it.
+        Args:
+            surf (pg.Surface): The logical frame.
+            dst (pg.Rect): Where it goes in the window (letterboxed).
+            smooth (bool): Linear filtering (fractional scales) or nearest (integer).
+            areas (list | None): Rects of `surf` that changed since the last
+                present; None uploads the whole frame.
+        """
+        tex = self._texture(surf.get_size(), smooth)
+        if areas is None or tex is not self._current:
+            tex.update(surf)
+        else:
+            for r in areas:
+                if r.w > 0 and r.h > 0:
+                    tex.update(surf.subsurface(r), r)
+        self._current = tex
+        self.renderer.draw_color = (0, 0, 0, 255)
+        self.renderer.clear()
+        tex.draw(dstrect=dst)
+        self.renderer.present()
@@ -0,0 +1,211 @@
+"""
+Platform navigation graph for enemy pathfinding.
+
+Built once per stage from its platform rects. Each platform is a node and its
+top surface is where an entity can stand. Directed edges say how to get from
+one platform to another:
+
+    walk   the platforms touch at the same height; keep walking
+    jump   the target is higher, within jump height and reach; jump from the
+           take-off zone towards it
+    drop   the target is the first platform below an edge; walk off it
+
+Jump height and reach come from the jump speed, gravity and run speed. They
+are also capped by the layout limits `Stage.make_platforms` guarantees
+(PLATFORM_MAX_JUMP / PLATFORM_MAX_DX).
+
+`route(src, dst)` returns the first edge of a shortest path (fewest hops). It
+is cached per (src, dst) pair, so steering an enemy is a couple of dict lookups
+per tick.
+"""
+import math
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+WALK, JUMP, DROP = "walk", "jump", "drop"
+
+
+class NavEdge:
+    """
+    One way to get from platform `src` to platform `dst`.
+    `direction` is the way to face (-1 left, 1 right). The move starts once the
+    entity's leading edge (right edge when going right, left edge when going
+    left) is inside [zone_min, zone_max].
+    """
+    __slots__ = ("src", "dst", "kind", "direction", "zone_min", "zone_max")
+
+    def __init__(self, src, dst, kind, direction, zone_min, zone_max):
+        self.src = src
+        self.dst = dst
+        self.kind = kind
+        self.direction = direction
+        self.zone_min = zone_min
+        self.zone_max = zone_max
+
+    def in_zone(self, rect) -> bool:
+        lead = rect.right if self.direction > 0 else rect.left
+        return self.zone_min <= lead <= self.zone_max
+
+    def __repr__(self):
+        return f"NavEdge({self.src}->{self.dst} {self.kind} dir={self.direction} zone=[{self.zone_min},{self.zone_max}])"
+
+
+class NavGraph:
+    """
+    Walk/jump/drop connectivity between the platforms of one stage.
+    """
+    ZONE = 8  # width of a jump take-off zone (px)
+
+    def __init__(self, platforms, gravity, jump_speed, run_speed, max_rise, max_dx, body_w=40, walk_speed=1.5):
+        """
+        Args:
+            platforms (list): The stage's platform rects (must not move).
+            gravity (float): Per-tick vertical acceleration.
+            jump_speed (float): Upward take-off speed (positive, px/tick).
+            run_speed (float): Horizontal speed of a jump (px/tick).
+            max_rise (int): Highest step up allowed between platforms (px).
+            max_dx (int): Widest horizontal gap allowed (px).
+            body_w (int): Width of the entities that will follow the graph.
+            walk_speed (float): Their walking speed (px/tick), which sets how far
+                they drift when walking off an edge.
+        """
+        self.platforms = platforms
+        self.gravity = gravity
+        self.jump_speed = jump_speed
+        self.run_speed = run_speed
+        self.max_rise = max_rise
+        self.max_dx = max_dx
+        self.body_w = body_w
+        self.walk_speed = walk_speed
+        self.edges: List[List[NavEdge]] = [[] for _ in platforms]
+        self._index = {id(p): i for i, p in enumerate(platforms)}
+        self._routes: Dict[Tuple[int, int], Optional[NavEdge]] = {}
+        self._below_key = None
+        self._below = None
+        for a in range(len(platforms)):
+            for b in range(len(platforms)):
+                if a != b:
+                    self._connect(a, b)
+
+    def jump_times(self, rise) -> Optional[Tuple[float, float]]:
+        """
+        Ticks after take-off at which a full-speed jump passes `rise` px above
+        the take-off height on the way up and on the way down, or None if the
+        jump can't get that high.
+        """
+        v, g = self.jump_speed, self.gravity
+        disc = v * v - 2 * g * rise
+        if disc < 0:
+            return None
+        return (v - math.sqrt(disc)) / g, (v + math.sqrt(disc)) / g
+
+    def _connect(self, a, b):
+        A, B = self.platforms[a], self.platforms[b]
+        rise = A.top - B.top  # > 0: B is higher
+        w, zone = self.body_w, self.ZONE
+        if abs(rise) <= 2:
+            if 0 <= B.left - A.right <= 2:
+                self.edges[a].append(NavEdge(a, b, WALK, 1, A.right - w, A.right + 2))
+            elif 0 <= A.left - B.right <= 2:
+                self.edges[a].append(NavEdge(a, b, WALK, -1, A.left - 2, A.left + w))
+            return
+        if rise > 0:
+            times = self.jump_times(rise + 2) if rise <= self.max_rise else None
+            if times is None:
+                return
+            # the leading edge has to stay clear of B until the feet are above its
+            # top (or it bumps its head underneath), then still reach B before landing
+            clear = math.ceil(self.run_speed * times[0])
+            reach = min(self.max_dx, self.run_speed * times[1] - zone)
+            hi = min(A.right, B.left - clear)
+            if hi - zone >= A.left + w and B.left - hi <= reach:
+                self.edges[a].append(NavEdge(a, b, JUMP, 1, hi - zone, hi))
+                return
+            lo = max(A.left, B.right + clear)
+            if lo + zone <= A.right - w and lo - B.right <= reach:
+                self.edges[a].append(NavEdge(a, b, JUMP, -1, lo, lo + zone))
+            return
+        # B is lower: walk off the edge of A where B is the first thing below
+        if self._landing(a, 1) == b:
+            self.edges[a].append(NavEdge(a, b, DROP, 1, A.right - w, A.right + w))
+        elif self._landing(a, -1) == b:
+            self.edges[a].append(NavEdge(a, b, DROP, -1, A.left - w, A.left + w))
+
+    def _landing(self, a, direction):
+        """
+        Platform an entity lands on after walking off the `direction` edge of
+        platform `a` at walking pace, or None if nothing is below.
+        """
+        A, w = self.platforms[a], self.body_w
+        best = None
+        for i, p in enumerate(self.platforms):
+            if p.top <= A.top:
+                continue
+            drift = self.walk_speed * math.sqrt(2 * (p.top - A.top) / self.gravity)
+            if direction > 0:
+                lo, hi = A.right, A.right + w + drift
+            else:
+                lo, hi = A.left - w - drift, A.left
+            if p.left < hi and lo < p.right and (best is None or p.top < self.platforms[best].top):
+                best = i
+        return best
+
+    def above_target(self, edge, rect) -> bool:
+        """
+        Whether an entity following `edge` through the air is over its target
+        platform with its feet above the top, i.e. about to land on it.
+        """
+        target = self.platforms[edge.dst]
+        return rect.bottom <= target.top and target.left <= rect.centerx < target.right
+
+    def platform_under(self, rect, grid) -> Optional[int]:
+        """
+        Index of the platform `rect` is standing on, or None if it isn't.
+        """
+        for p in grid.near(rect.move(0, 1)):
+            if p.top == rect.bottom and p.left < rect.right and rect.left < p.right:
+                return self._index[id(p)]
+        return None
+
+    def platform_below(self, rect) -> Optional[int]:
+        """
+        Index of the highest platform at or below `rect`'s feet that it overlaps
+        horizontally (where it is standing or will land), or None.
+        """
+        key = (rect.left, rect.right, rect.bottom)
+        if key != self._below_key:
+            best = None
+            for i, p in enumerate(self.platforms):
+                if p.top >= rect.bottom and p.left < rect.right and rect.left < p.right:
+                    if best is None or p.top < self.platforms[best].top:
+                        best = i
+            self._below_key, self._below = key, best
+        return self._below
+
+    def route(self, src: int, dst: int) -> Optional[NavEdge]:
+        """
+        First edge of a shortest path from platform `src` to `dst`, or None if
+        `dst` can't be reached (or src == dst). Cached.
+        """
+        key = (src, dst)
+        if key not in self._routes:
+            self._routes[key] = self._search(src, dst)
+        return self._routes[key]
+
+    def _search(self, src, dst):
+        if src == dst:
+            return None
+        first: Dict[int, NavEdge] = {}
+        queue = deque([src])
+        seen = {src}
+        while queue:
+            node = queue.popleft()
+            for edge in self.edges[node]:
+                if edge.dst in seen:
+                    continue
+                seen.add(edge.dst)
+                first[edge.dst] = first.get(node, edge)
+                if edge.dst == dst:
+                    return first[dst]
+                queue.append(edge.dst)
+        return None
@@ -0,0 +1,83 @@
+"""
+Enemy perception: throttled, cached line-of-sight queries.
+
+Unaware enemies only need line of sight to the player when the player is inside
+their 100px awareness field, so `Enemy.ai` culls by distance first and asks this
+module only for the few nearby enemies. Those answers are cached per enemy and
+reused until either end of the sight line moves more than `move_threshold`
+pixels or the answer is `max_age` ticks old. Raycasts are capped at
+`budget` per tick: past the cap, enemies that already have an answer keep it
+until a later tick has budget left, so a crowd around the player is spread over
+several frames instead of spiking one.
+
+Everything here depends only on simulation state, so seeded runs and replays
+stay deterministic.
+"""
+
+
+class LosCache:
+    """
+    Last sight-line answer for one enemy.
+    """
+    __slots__ = ("ax", "ay", "bx", "by", "visible", "tick")
+
+    def __init__(self, ax, ay, bx, by, visible, tick):
+        self.ax, self.ay = ax, ay
+        self.bx, self.by = bx, by
+        self.visible = visible
+        self.tick = tick
+
+
+class Perception:
+    """
+    Per-stage line-of-sight service with a per-tick raycast budget.
+    """
+    def __init__(self, budget=8, move_threshold=6, max_age=12):
+        """
+        Args:
+            budget (int): Raycasts allowed per tick once every asker has an answer.
+            move_threshold (int): Pixels either endpoint may move before a cached
+                answer is recomputed.
+            max_age (int): Ticks after which an answer is recomputed regardless.
+        """
+        self.budget = budget
+        self.move_threshold = move_threshold
+        self.max_age = max_age
+        self.tick = 0
+        self.left = budget
+        self.casts = 0  # raycasts done (for profiling)
+        self.queries = 0
+
+    def begin_tick(self):
+        """
+        Start a new simulation tick: refill the raycast budget.
+        """
+        self.tick += 1
+        self.left = self.budget
+
+    def line_of_sight(self, enemy, player, grid) -> bool:
+        """
+        Whether `enemy` can see `player`, from cache when it is still fresh.
+        """
+        self.queries += 1
+        ax, ay = enemy.rect.center
+        bx, by = player.rect.center
+        cache = enemy.los_cache
+        if cache is not None:
+            t = self.move_threshold
+            fresh = (abs(ax - cache.ax) <= t and abs(ay - cache.ay) <= t and
+                     abs(bx - cache.bx) <= t and abs(by - cache.by) <= t and
+                     self.tick - cache.tick < self.max_age)
+            if fresh or self.left <= 0:
+                return cache.visible
+        # first answer for this enemy is always cast, budget or not
+        self.left -= 1
+        self.casts += 1
+        visible = enemy.has_line_of_sight(player, grid)
+        if cache is None:
+            enemy.los_cache = LosCache(ax, ay, bx, by, visible, self.tick)
+        else:
+            cache.ax, cache.ay, cache.bx, cache.by = ax, ay, bx, by
+            cache.visible = visible
+            cache.tick = self.tick
+        return visible
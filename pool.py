@@ -0,0 +1,72 @@
+"""
+Free-list object pools for short-lived game objects.
+
+Enemies, floor drops and projectiles are created and destroyed continuously in
+a fight. Allocating a fresh object for each one, and dropping it again, churns
+the allocator and feeds the cyclic garbage collector. A big fight then shows up
+as GC pauses. A `Pool` keeps released objects on a free list and hands them
+back out through their `reset` method, so steady-state combat allocates
+nothing.
+
+Pooled classes implement `reset(*args)` taking the same arguments as
+`__init__`. It must restore every field, because a reused object must be
+indistinguishable from a new one (seeded runs and replays rely on it).
+
+Lists of live objects use `swap_remove` (O(1), order not kept) instead of
+`list.remove` (O(n)).
+"""
+from typing import Callable, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+
+class Pool(Generic[T]):
+    """
+    Free list of released objects of one class.
+    """
+    def __init__(self, factory: Callable[..., T], limit=1024):
+        """
+        Args:
+            factory (callable): Builds a new object when the free list is empty
+                (usually the class itself).
+            limit (int): Most objects kept on the free list; extra releases
+                are left to the garbage collector.
+        """
+        self.factory = factory
+        self.limit = limit
+        self.free: List[T] = []
+        self.created = 0  # objects built by the factory (for profiling)
+
+    def acquire(self, *args) -> T:
+        """
+        Return a released object reset with `args`, or a new one.
+        """
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            return obj
+        self.created += 1
+        return self.factory(*args)
+
+    def release(self, obj: T):
+        """
+        Hand `obj` back. The caller must not use it afterwards.
+        """
+        if len(self.free) < self.limit:
+            self.free.append(obj)
+
+    def __len__(self):
+        return len(self.free)
+
+
+def swap_remove(items: list, i: int):
+    """
+    Remove and return items[i] in O(1) by moving the last element into its
+    place. The order of the remaining items changes.
+    """
+    last = items.pop()
+    if i == len(items):
+        return last
+    item = items[i]
+    items[i] = last
+    return item
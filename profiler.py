@@ -0,0 +1,221 @@
+"""
+Lightweight per-frame profiler.
+
+Code marks the parts of a frame it wants timed with
+
+    with profiler.section("stage.draw"):
+        ...
+
+and the main loop brackets each frame with `begin_frame()` / `end_frame()`.
+While disabled (the default) `section` returns a shared no-op context, so the
+instrumentation can stay in hot paths. When enabled (F3 in game), the last
+frames are kept in a rolling history that `draw` renders as an on-screen graph
+with p50/p99 frame times and `dump` writes to a CSV or JSON trace file (F4).
+
+Section times are inclusive and summed over the frame, so a section entered once
+per enemy reports the total for all enemies together with its call count.
+"""
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Dict, List
+
+import pygame as pg
+
+_NULL = nullcontext()
+
+
+class _Section:
+    """
+    Reusable timing context for one section name.
+    """
+    __slots__ = ("profiler", "name", "t0")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Profiler:
+    """
+    Collects per-section timings for each frame and keeps a rolling history.
+    """
+    TEXT_INTERVAL = 0.25  # seconds between refreshes of the overlay's numbers
+    def __init__(self, history=600):
+        """
+        Args:
+            history (int): Number of most recent frames kept for stats and dumps.
+        """
+        self.enabled = False
+        self.frames: "deque[dict]" = deque(maxlen=history)
+        self._sections: Dict[str, _Section] = {}
+        self._current: Dict[str, List[float]] = {}
+        self._frame_start = None
+        self._frame_no = 0
+        # overlay: panel reused between frames, stat lines re-rendered every TEXT_INTERVAL
+        self._panel = None
+        self._names: List[str] = []
+        self._lines: List[pg.Surface] = []
+        self._lines_time = None
+
+    def toggle(self):
+        """
+        Switch recording on or off. Turning it on starts a fresh history.
+        """
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.frames.clear()
+        self._frame_start = None
+        self._lines_time = None
+
+    def section(self, name: str):
+        """
+        Context manager timing the enclosed block under `name`.
+        """
+        if not self.enabled:
+            return _NULL
+        s = self._sections.get(name)
+        if s is None:
+            s = self._sections[name] = _Section(self, name)
+        return s
+
+    def begin_frame(self):
+        """
+        Mark the start of a frame.
+        """
+        self._frame_no += 1
+        if self.enabled:
+            self._current = {}
+            self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """
+        Mark the end of a frame and record it in the history.
+        """
+        if not self.enabled or self._frame_start is None:
+            return
+        total = time.perf_counter() - self._frame_start
+        self.frames.append({
+            "frame": self._frame_no,
+            "ms": total * 1000.0,
+            "sections": {name: (t * 1000.0, n) for name, (t, n) in self._current.items()},
+        })
+        self._frame_start = None
+
+    def _add(self, name, seconds):
+        entry = self._current.get(name)
+        if entry is None:
+            self._current[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def percentile(self, p: float, name=None) -> float:
+        """
+        The p-th percentile (0-100) of frame time, or of one section's time, in ms.
+        """
+        if name is None:
+            values = sorted(f["ms"] for f in self.frames)
+        else:
+            values = sorted(f["sections"].get(name, (0.0, 0))[0] for f in self.frames)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+    def section_names(self) -> List[str]:
+        """
+        Every section seen in the history, slowest (by p50) first.
+        """
+        names = {name for f in self.frames for name in f["sections"]}
+        return sorted(names, key=lambda n: -self.percentile(50, n))
+
+    def dump(self, path: str):
+        """
+        Write the history to `path`: JSON if it ends in .json, otherwise CSV with
+        one row per frame and a ms/calls column pair per section.
+        """
+        names = self.section_names()
+        try:
+            with open(path, "w") as f:
+                if path.endswith(".json"):
+                    json.dump({
+                        "p50_ms": self.percentile(50),
+                        "p99_ms": self.percentile(99),
+                        "frames": [
+                            {"frame": fr["frame"], "ms": fr["ms"],
+                             "sections": {k: {"ms": v[0], "calls": v[1]} for k, v in fr["sections"].items()}}
+                            for fr in self.frames
+                        ],
+                    }, f, indent=1)
+                else:
+                    f.write(",".join(["frame", "ms"] + [f"{n}_ms,{n}_calls" for n in names]) + "\n")
+                    for fr in self.frames:
+                        row = [str(fr["frame"]), f"{fr['ms']:.3f}"]
+                        for n in names:
+                            t, calls = fr["sections"].get(n, (0.0, 0))
+                            row += [f"{t:.3f}", str(calls)]
+                        f.write(",".join(row) + "\n")
+            print(f"Wrote profile trace {path} ({len(self.frames)} frames)")
+        except Exception as e:
+            print(f"Failed to write profile trace {path}:", e)
+
+    def overlay_rect(self, surf) -> pg.Rect:
+        """
+        Where `draw` puts the overlay on `surf`.
+        """
+        return pg.Rect(surf.get_width() - 330, 10, 320, 110 + 16 * min(8, len(self._names)))
+
+    def draw(self, surf, font, budget_ms=1000.0 / 60):
+        """
+        Draw the frame-time graph and the slowest sections in the top right
+        corner of `surf`. The dashed line is the frame budget.
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._lines_time is None or now - self._lines_time >= self.TEXT_INTERVAL:
+            self._render_lines(font)
+            self._lines_time = now
+        area = self.overlay_rect(surf)
+        if self._panel is None or self._panel.get_size() != area.size:
+            self._panel = pg.Surface(area.size, pg.SRCALPHA)
+        panel = self._panel
+        panel.fill((0, 0, 0, 170))
+        graph_h = 60
+        scale = graph_h / (budget_ms * 2)
+        frames = list(self.frames)[-area.w:]
+        for i, fr in enumerate(frames):
+            h = min(graph_h, int(fr["ms"] * scale))
+            col = (80, 220, 80) if fr["ms"] <= budget_ms else (240, 80, 60)
+            pg.draw.line(panel, col, (i, graph_h), (i, graph_h - h))
+        budget_y = graph_h - int(budget_ms * scale)
+        for x in range(0, area.w, 8):
+            pg.draw.line(panel, (255, 255, 255), (x, budget_y), (x + 3, budget_y))
+        y = graph_h + 6
+        for i, img in enumerate(self._lines):
+            panel.blit(img, (6, y))
+            y += 20 if i == 0 else 16
+        surf.blit(panel, area)
+
+    def _render_lines(self, font):
+        # the percentile stats sort the whole history, so they are refreshed a few
+        # times a second rather than computed and rasterised every frame
+        self._names = self.section_names()[:8]
+        line = f"frame p50 {self.percentile(50):.2f} ms  p99 {self.percentile(99):.2f} ms"
+        self._lines = [font.render(line, True, (255, 255, 255))]
+        for name in self._names:
+            line = f"{name:<16} p50 {self.percentile(50, name):6.2f}  p99 {self.percentile(99, name):6.2f}"
+            self._lines.append(font.render(line, True, (220, 220, 220)))
+
+# Shared by the game loop and the simulation core
+profiler = Profiler()
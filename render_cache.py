@@ -0,0 +1,213 @@
+"""
+Caches for finished render surfaces.
+
+Sprites in this game are drawn at a handful of fixed sizes (an enemy is always
+40×50, a platform keeps its size for the whole stage), so rescaling them every
+frame is wasted work. Everything here is keyed by what the result looks like and
+kept in a size-bounded LRU, so steady-state frames are plain blits.
+
+Text goes through the same idea: `text()` keeps rendered strings in a
+`TextCache`, and a `GlyphFont` pre-renders a small character set (digits by
+default) for numbers that change too often to be worth caching whole.
+"""
+import string
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import pygame as pg
+
+
+class SurfaceCache:
+    """
+    LRU cache of transformed surfaces keyed by
+    (source image, target size, horizontal flip, alpha, smooth scaling).
+    Evicts least recently used entries once the cached pixels exceed max_bytes.
+    """
+    def __init__(self, max_bytes=48 * 1024 * 1024):
+        """
+        Args:
+            max_bytes (int): Budget for cached pixel data (4 bytes per pixel).
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Tuple[pg.Surface, pg.Surface, int]]" = OrderedDict()
+
+    def get(self, src: pg.Surface, size, flip_x=False, alpha: Optional[int] = None, smooth=False) -> pg.Surface:
+        """
+        Return `src` scaled to `size`, optionally mirrored and with a surface alpha.
+        The result is built once and shared; callers must not draw onto it.
+        """
+        size = (int(size[0]), int(size[1]))
+        key = (id(src), size, flip_x, alpha, smooth)
+        entry = self._entries.get(key)
+        # the source is kept in the entry so its id can't be reused while cached
+        if entry is not None and entry[0] is src:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        if size == src.get_size():
+            img = src.copy() if (flip_x or alpha is not None) else src
+        elif smooth:
+            img = pg.transform.smoothscale(src, size)
+        else:
+            img = pg.transform.scale(src, size)
+        if flip_x:
+            img = pg.transform.flip(img, True, False)
+        if img is not src and pg.display.get_surface() is not None:
+            img = img.convert_alpha()
+        if alpha is not None:
+            img.set_alpha(alpha)
+        self._store(key, src, img)
+        return img
+
+    def build(self, key, make, src: Optional[pg.Surface] = None) -> pg.Surface:
+        """
+        Return the surface cached under `key`, calling `make()` to create it on a miss.
+        For composed images (e.g. item icons) that aren't a plain transform of one source.
+        If the image is made from `src`, pass it so a stale entry for a freed
+        surface with the same id is not returned.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is src:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        img = make()
+        self._store(key, src, img)
+        return img
+
+    def solid(self, size, rgba) -> pg.Surface:
+        """
+        Return a cached per-pixel-alpha surface of `size` filled with `rgba`.
+        """
+        size = (int(size[0]), int(size[1]))
+        def make():
+            img = pg.Surface(size, pg.SRCALPHA)
+            img.fill(rgba)
+            return img
+        return self.build(("solid", size, tuple(rgba)), make)
+
+    def _store(self, key, src, img):
+        nbytes = img.get_width() * img.get_height() * 4
+        self._entries[key] = (src, img, nbytes)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, old_bytes) = self._entries.popitem(last=False)
+            self.bytes -= old_bytes
+
+    def clear(self):
+        """
+        Drop every cached surface (e.g. after the display mode changes).
+        """
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by every draw path (enemies, boss, platforms, awareness indicator)
+sprite_cache = SurfaceCache()
+
+
+def scaled(src: pg.Surface, size, flip_x=False, alpha: Optional[int] = None, smooth=False) -> pg.Surface:
+    """
+    Shorthand for sprite_cache.get(): a cached scaled copy of `src`.
+    """
+    return sprite_cache.get(src, size, flip_x, alpha, smooth)
+
+
+class TextCache:
+    """
+    LRU cache of rendered strings keyed by (font, text, colour, antialias).
+    """
+    def __init__(self, max_entries=512):
+        """
+        Args:
+            max_entries (int): Most strings kept before the least recently used is dropped.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, pg.Surface]" = OrderedDict()
+
+    def render(self, font: pg.font.Font, text: str, colour, antialias=True) -> pg.Surface:
+        """
+        Return `font.render(text, antialias, colour)`, rendered once and shared;
+        callers must not draw onto it.
+        """
+        key = (font, text, tuple(colour), antialias)
+        img = self._entries.get(key)
+        if img is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return img
+        self.misses += 1
+        img = font.render(text, antialias, colour)
+        self._entries[key] = img
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return img
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class GlyphFont:
+    """
+    Bitmap font: every character of `chars` rendered once in one font and colour.
+    Drawing a string is then one blit per character, with no rasterisation, which
+    suits numbers that change every few frames (XP, coins). Characters outside
+    the set are rendered through `text_cache`.
+    """
+    def __init__(self, font: pg.font.Font, colour, antialias=True, chars=string.digits + " +-:/"):
+        """
+        Args:
+            font (pg.font.Font): Font to render the glyphs with.
+            colour (tuple): Text colour.
+            antialias (bool): Antialiased glyphs.
+            chars (str): Characters to pre-render.
+        """
+        self.font = font
+        self.colour = colour
+        self.antialias = antialias
+        self.glyphs = {c: font.render(c, antialias, colour) for c in chars}
+        self.height = font.get_height()
+
+    def glyph(self, c) -> pg.Surface:
+        img = self.glyphs.get(c)
+        if img is None:
+            img = text_cache.render(self.font, c, self.colour, self.antialias)
+        return img
+
+    def size(self, text: str) -> Tuple[int, int]:
+        return sum(self.glyph(c).get_width() for c in text), self.height
+
+    def draw(self, surf: pg.Surface, text: str, pos) -> pg.Rect:
+        """
+        Blit `text` with its top-left at `pos`; returns the area drawn.
+        """
+        x, y = pos
+        for c in text:
+            img = self.glyph(c)
+            surf.blit(img, (x, y))
+            x += img.get_width()
+        return pg.Rect(pos[0], y, x - pos[0], self.height)
+
+
+# Shared by every text draw path (HUD, inventory, menus)
+text_cache = TextCache()
+
+
+def text(font: pg.font.Font, s: str, colour, antialias=True) -> pg.Surface:
+    """
+    Shorthand for text_cache.render(): a cached rendering of `s`.
+    """
+    return text_cache.render(font, s, colour, antialias)
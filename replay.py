@@ -0,0 +1,186 @@
+"""
+Input recording and deterministic replay.
+
+A run is fully determined by its seed (see `GameSession`), the player's starting
+state and the InputState fed to every tick. `InputRecorder` captures those into
+a compact file; `play_replay` feeds them back to a fresh session as fast as the
+simulation allows, so a regression or desync seen in one run can be reproduced
+on demand (`python3 headless.py --replay run.rpl`).
+
+File layout (little-endian):
+
+    header    "<4sBQHH"  magic, version, seed, stage number, player-state length
+              player state in the savegame binary format
+    runs      "<I" count, then "<HBhh" per run: ticks, button flags, aim x, aim y
+    checks    "<I" count, then "<II" per check: tick, CRC32 of the session state
+
+Consecutive identical inputs are stored as one run, so holding a direction for
+ten seconds costs 7 bytes. A state checksum is stored every CHECK_EVERY ticks;
+replay compares against them and reports the first checkpoint that diverged.
+"""
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+from game_core import HEIGHT, InputState, Player, GameSession
+from savegame import decode_save, encode_save
+
+REPLAY_MAGIC = b"UAPR"
+REPLAY_VERSION = 1
+CHECK_EVERY = 60  # ticks between state checksums (one per simulated second)
+
+_HEADER = struct.Struct("<4sBQHH")
+_COUNT = struct.Struct("<I")
+_RUN = struct.Struct("<HBhh")
+_CHECK = struct.Struct("<II")
+_BUTTONS = ("left", "right", "jump", "attack", "ability", "pickup")
+
+
+def pack_input(inp: InputState) -> Tuple[int, int, int]:
+    """
+    (button bit flags, aim x, aim y) for one tick, aim clamped to int16.
+    """
+    flags = 0
+    for bit, name in enumerate(_BUTTONS):
+        if getattr(inp, name):
+            flags |= 1 << bit
+    ax = max(-32768, min(32767, int(inp.aim[0])))
+    ay = max(-32768, min(32767, int(inp.aim[1])))
+    return flags, ax, ay
+
+
+def unpack_input(flags: int, ax: int, ay: int) -> InputState:
+    """
+    Inverse of `pack_input`.
+    """
+    return InputState(*(bool(flags & (1 << bit)) for bit in range(len(_BUTTONS))), aim=(ax, ay))
+
+
+def session_checksum(session: GameSession) -> int:
+    """
+    CRC32 over the state a desync would show up in first: clock, stage, player
+    position/health/xp and every mob's position and health.
+    """
+    p = session.player
+    parts = [session.stage_num, int(session.now), p.rect.x, p.rect.y, int(p.hp), p.xp,
+             len(session.stage.mobs), len(session.stage.drops)]
+    for m in session.stage.mobs:
+        parts += [m.rect.x, m.rect.y, int(m.hp)]
+    return zlib.crc32(repr(parts).encode())
+
+
+class InputRecorder:
+    """
+    Records the inputs fed to one GameSession.
+    """
+    def __init__(self, session: GameSession):
+        """
+        Start recording `session`. Must be created before its first tick.
+        """
+        self.seed = session.seed
+        self.stage_num = session.stage_num
+        self.player_state = encode_save(session.player.to_dict())
+        self.runs: List[list] = []  # [ticks, flags, ax, ay]
+        self.checks: List[Tuple[int, int]] = []
+        self.ticks = 0
+
+    def record(self, inp: InputState, session: GameSession):
+        """
+        Log the input of a tick; call right after `session.tick(inp)`.
+        """
+        packed = pack_input(inp)
+        last = self.runs[-1] if self.runs else None
+        if last is not None and tuple(last[1:]) == packed and last[0] < 0xFFFF:
+            last[0] += 1
+        else:
+            self.runs.append([1, *packed])
+        self.ticks += 1
+        if self.ticks % CHECK_EVERY == 0:
+            self.checks.append((self.ticks, session_checksum(session)))
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.stage_num, len(self.player_state)))
+        out += self.player_state
+        out += _COUNT.pack(len(self.runs))
+        for run in self.runs:
+            out += _RUN.pack(*run)
+        out += _COUNT.pack(len(self.checks))
+        for check in self.checks:
+            out += _CHECK.pack(*check)
+        return bytes(out)
+
+    def save(self, path: str):
+        """
+        Write the recording to `path`.
+        """
+        try:
+            with open(path, "wb") as f:
+                f.write(self.to_bytes())
+        except Exception as e:
+            print(f"Failed to save replay {path}:", e)
+
+
+class Replay:
+    """
+    A recording loaded from disk.
+    """
+    def __init__(self, seed, stage_num, player_state, inputs, checks):
+        self.seed = seed
+        self.stage_num = stage_num
+        self.player_state = player_state
+        self.inputs: List[InputState] = inputs
+        self.checks = dict(checks)
+
+    @classmethod
+    def load(cls, path: str) -> "Replay":
+        """
+        Read a file written by `InputRecorder.save`. Raises ValueError if it
+        isn't a replay this version understands.
+        """
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            magic, version, seed, stage_num, n_state = _HEADER.unpack_from(raw, 0)
+            if magic != REPLAY_MAGIC or version > REPLAY_VERSION:
+                raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+            pos = _HEADER.size
+            player_state = decode_save(raw[pos:pos + n_state])
+            pos += n_state
+            inputs = []
+            (n_runs,) = _COUNT.unpack_from(raw, pos)
+            pos += _COUNT.size
+            for _ in range(n_runs):
+                ticks, flags, ax, ay = _RUN.unpack_from(raw, pos)
+                pos += _RUN.size
+                inp = unpack_input(flags, ax, ay)
+                inputs.extend([inp] * ticks)  # InputState is never mutated by the core
+            (n_checks,) = _COUNT.unpack_from(raw, pos)
+            pos += _COUNT.size
+            checks = [_CHECK.unpack_from(raw, pos + i * _CHECK.size) for i in range(n_checks)]
+        except struct.error as e:
+            raise ValueError(f"truncated replay {path}: {e}") from e
+        return cls(seed, stage_num, player_state, inputs, checks)
+
+    def new_session(self) -> GameSession:
+        """
+        A session in the recorded starting state.
+        """
+        player = Player(100, HEIGHT-200)
+        player.from_dict(self.player_state)
+        return GameSession(player, stage_num=self.stage_num, seed=self.seed)
+
+
+def play_replay(replay: Replay, verify=True) -> Tuple[GameSession, Optional[int]]:
+    """
+    Run the recorded inputs through a fresh session as fast as possible.
+    Returns the final session and the first checkpoint tick whose checksum
+    didn't match the recording (None if the replay stayed in sync or `verify` is off).
+    """
+    session = replay.new_session()
+    desync = None
+    for tick, inp in enumerate(replay.inputs, 1):
+        session.tick(inp)
+        if verify and desync is None and tick in replay.checks:
+            if session_checksum(session) != replay.checks[tick]:
+                desync = tick
+    return session, desync
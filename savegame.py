@@ -0,0 +1,243 @@
+"""
+Background writer and compact binary format for the player save.
+
+Saving used to be a `json.dump` straight onto the only save file on the main
+thread, so a crash mid-write lost the save and every tavern sale stalled a
+frame. `SaveWriter.save` now just hands the data to a writer thread, which keeps
+only the newest request (rapid saves coalesce into one write), writes it to a
+temp file, fsyncs and atomically renames it over the save. The previous saves
+are kept as numbered backups (player_save.dat.1 is the newest) and `load` falls
+back to them if the main file is missing or unreadable.
+
+Saves are written in a small versioned binary format (see `encode_save`): item
+type, rarity and armour set are stored as one-byte codes instead of JSON
+strings. Old JSON saves are still read, so an existing player_save.json is
+picked up and rewritten in the new format on the next save.
+"""
+import atexit
+import json
+import os
+import struct
+import threading
+from typing import Callable, Optional, Sequence
+
+# ----------------------------- BINARY FORMAT --------------------------
+#   header    "<4sBii"  magic, version, xp, coins
+#   counts    "<BB"     inventory slots, armour slots
+#   item      "<BBB"    type, rarity, set   (type EMPTY = empty slot)
+#             set NAMED is followed by "<B" length + UTF-8 name for items whose
+#             name isn't derived from type/set
+# Inventory slots come first in order, then armour in ARMOR_SLOTS order.
+# Codes are only ever appended to, so older saves keep decoding.
+SAVE_MAGIC = b"UAPS"
+SAVE_VERSION = 1
+ITEM_TYPES = ("dagger", "sword", "rapier", "helmet", "chest", "legs", "boots")
+RARITIES = ("common", "uncommon", "rare", "holy", "godlike")
+ARMOR_SETS = ("ninja", "knight", "mage")
+ARMOR_SLOTS = ("helmet", "chest", "legs", "boots")
+EMPTY = 0xFF
+NO_SET = 0xFE   # weapon: name == type
+NAMED = 0xFD    # explicit name follows
+
+_HEADER = struct.Struct("<4sBii")
+_COUNTS = struct.Struct("<BB")
+_ITEM = struct.Struct("<BBB")
+_TYPE_CODE = {t: i for i, t in enumerate(ITEM_TYPES)}
+_RARITY_CODE = {r: i for i, r in enumerate(RARITIES)}
+_SET_CODE = {s: i for i, s in enumerate(ARMOR_SETS)}
+
+
+def _encode_item(item: Optional[dict], out: bytearray):
+    if item is None:
+        out += _ITEM.pack(EMPTY, 0, 0)
+        return
+    name, type_ = item["name"], item["type"]
+    prefix, _, slot = name.partition(" ")
+    if name == type_:
+        set_code = NO_SET
+    elif slot == type_ and prefix in _SET_CODE:
+        set_code = _SET_CODE[prefix]
+    else:
+        set_code = NAMED
+    out += _ITEM.pack(_TYPE_CODE[type_], _RARITY_CODE[item["rarity"]], set_code)
+    if set_code == NAMED:
+        raw = name.encode("utf-8")[:255]
+        out += bytes((len(raw),)) + raw
+
+
+def _decode_item(buf: bytes, pos: int):
+    type_code, rarity_code, set_code = _ITEM.unpack_from(buf, pos)
+    pos += _ITEM.size
+    if type_code == EMPTY:
+        return None, pos
+    type_ = ITEM_TYPES[type_code]
+    if set_code == NO_SET:
+        name = type_
+    elif set_code == NAMED:
+        n = buf[pos]
+        name = buf[pos + 1:pos + 1 + n].decode("utf-8")
+        pos += 1 + n
+    else:
+        name = f"{ARMOR_SETS[set_code]} {type_}"
+    return {"name": name, "type": type_, "rarity": RARITIES[rarity_code]}, pos
+
+
+def encode_save(data: dict) -> bytes:
+    """
+    Pack a `Player.to_dict()` dict into the binary save format.
+    """
+    inventory = data.get("inventory", [])
+    armor = data.get("armor", {})
+    out = bytearray(_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, data.get("xp", 0), data.get("coins", 0)))
+    out += _COUNTS.pack(len(inventory), len(ARMOR_SLOTS))
+    for item in inventory:
+        _encode_item(item, out)
+    for slot in ARMOR_SLOTS:
+        _encode_item(armor.get(slot), out)
+    return bytes(out)
+
+
+def decode_save(raw: bytes) -> dict:
+    """
+    Inverse of `encode_save`. Anything without the binary magic is parsed as a
+    legacy JSON save. Raises ValueError on a truncated or unknown-version file.
+    """
+    if not raw.startswith(SAVE_MAGIC):
+        return json.loads(raw.decode("utf-8"))
+    try:
+        _, version, xp, coins = _HEADER.unpack_from(raw, 0)
+        if version > SAVE_VERSION:
+            raise ValueError(f"save version {version} is newer than {SAVE_VERSION}")
+        n_inv, n_armor = _COUNTS.unpack_from(raw, _HEADER.size)
+        pos = _HEADER.size + _COUNTS.size
+        inventory = []
+        for _ in range(n_inv):
+            item, pos = _decode_item(raw, pos)
+            inventory.append(item)
+        armor = {}
+        for i in range(n_armor):
+            item, pos = _decode_item(raw, pos)
+            if i < len(ARMOR_SLOTS):
+                armor[ARMOR_SLOTS[i]] = item
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"corrupt save: {e}") from e
+    return {"xp": xp, "coins": coins, "inventory": inventory, "armor": armor}
+
+
+class SaveWriter:
+    """
+    Coalescing, crash-safe writer for one save file.
+    """
+    def __init__(self, path: str, backups=3, legacy: Sequence[str] = (),
+                 encode=encode_save, decode=decode_save):
+        """
+        Args:
+            path (str): The save file.
+            backups (int): How many previous saves to keep as path.1 .. path.N.
+            legacy (list): Older save files to read if path and its backups are
+                missing (never written to).
+            encode, decode: Convert between the save dict and file bytes.
+        """
+        self.path = path
+        self.backups = backups
+        self.legacy = list(legacy)
+        self.encode = encode
+        self.decode = decode
+        self._cond = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._thread = None
+        self.writes = 0
+
+    def save(self, data: dict):
+        """
+        Queue `data` to be written. Returns immediately; if a write is already
+        queued it is replaced, so only the newest state hits the disk.
+        """
+        with self._cond:
+            self._pending = data
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every queued save is on disk. Returns False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def candidates(self):
+        """
+        The save file followed by its backups, newest first.
+        """
+        return [self.path] + [f"{self.path}.{i}" for i in range(1, self.backups + 1)]
+
+    def load(self, apply: Optional[Callable[[dict], object]] = None):
+        """
+        Return the newest readable save (after waiting for queued writes), or
+        None if there is none. With `apply`, each candidate is passed to it and
+        a candidate that raises is skipped like a corrupt file.
+        """
+        self.flush()
+        for path in self.candidates() + self.legacy:
+            try:
+                with open(path, "rb") as f:
+                    data = self.decode(f.read())
+                if apply is not None:
+                    apply(data)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Failed to load save {path}:", e)
+                continue
+            if path != self.path:
+                print(f"Loaded save from {path}")
+            return data
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                data, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._write(data)
+            except Exception as e:
+                print("Failed to save player data:", e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write(self, data):
+        tmp = self.path + ".tmp"
+        raw = self.encode(data)
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        # shift backups: path.N-1 -> path.N, ..., path -> path.1
+        names = self.candidates()
+        for older, newer in reversed(list(zip(names[1:], names[:-1]))):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        os.replace(tmp, self.path)
+        self._sync_dir()
+        self.writes += 1
+
+    def _sync_dir(self):
+        # make the renames themselves durable where the OS allows it
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,121 @@
+"""
+Scene stack and the game's single main loop.
+
+Every screen of the game (start menu, smeltery, tavern, a run) is a `Scene`.
+The `SceneManager` keeps the active scenes on a stack and runs one loop for all
+of them. Each frame it ticks the clock at the top scene's frame rate, hands the
+scene that frame's events to update on, and lets it draw.
+
+Opening a screen pushes it and leaving it pops back to the one underneath. Nothing
+calls into another screen's loop, so the call stack stays the same depth however
+long the session runs. Covered scenes keep their state, so going back to a
+menu doesn't rebuild it or re-read anything from disk.
+"""
+from typing import List, Optional
+
+import pygame as pg
+
+
+class Scene:
+    """
+    One screen. Subclasses override the hooks they need; all default to no-ops.
+    """
+    fps = 60  # frame cap while this scene is on top (0 = uncapped)
+
+    def __init__(self):
+        self.manager: Optional["SceneManager"] = None
+
+    def enter(self):
+        """
+        Called when the scene is pushed onto the stack.
+        """
+
+    def exit(self):
+        """
+        Called when the scene is popped off the stack (also on quit).
+        """
+
+    def pause(self):
+        """
+        Called when another scene is pushed on top of this one.
+        """
+
+    def resume(self):
+        """
+        Called when this scene is on top again after the one above it popped.
+        """
+
+    def handle_event(self, event):
+        """
+        React to one pygame event.
+        """
+
+    def update(self, dt, events):
+        """
+        Advance the scene by one frame.
+        Args:
+            dt (int): Milliseconds since the previous frame.
+            events (list): The pygame events of this frame.
+        """
+        for event in events:
+            self.handle_event(event)
+
+    def draw(self):
+        """
+        Draw the frame and present it. Skipped if `update` left the scene.
+        """
+
+
+class SceneManager:
+    """
+    Stack of scenes driven by one main loop.
+    """
+    def __init__(self, clock: pg.time.Clock):
+        """
+        Args:
+            clock (pg.time.Clock): Clock used for frame pacing.
+        """
+        self.clock = clock
+        self.stack: List[Scene] = []
+
+    @property
+    def top(self) -> Optional[Scene]:
+        return self.stack[-1] if self.stack else None
+
+    def push(self, scene: Scene):
+        """
+        Put `scene` on top; the current top scene is paused underneath it.
+        """
+        if self.stack:
+            self.stack[-1].pause()
+        scene.manager = self
+        self.stack.append(scene)
+        scene.enter()
+
+    def pop(self) -> Scene:
+        """
+        Leave the top scene and resume the one underneath.
+        """
+        scene = self.stack.pop()
+        scene.exit()
+        if self.stack:
+            self.stack[-1].resume()
+        return scene
+
+    def quit(self):
+        """
+        Leave every scene, top first; `run` returns once the stack is empty.
+        """
+        while self.stack:
+            self.stack.pop().exit()
+
+    def run(self):
+        """
+        Main loop: runs until the last scene is popped.
+        """
+        while self.stack:
+            scene = self.stack[-1]
+            dt = self.clock.tick(scene.fps)
+            scene.update(dt, pg.event.get())
+            if self.top is scene:
+                scene.draw()
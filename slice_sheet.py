@@ -1,25 +1,87 @@
 #!/usr/bin/env python3
-import pygame as pg, os, glob
-pg.init()
+"""
+Build-time sprite atlas packer.
+
+Slices every sprite sheet in SRC into FRAME_W×FRAME_H frames and packs each
+sheet's frames into one atlas PNG plus a small JSON index of frame rects:
+
+    sprite_frames/<sheet>.png    packed frames
+    sprite_frames/<sheet>.json   {"image": "<sheet>.png", "frames": [[x, y, w, h], ...]}
+
+`AnimSprite("sprite_frames/<sheet>.json")` loads the atlas with a single image
+decode and slices the frames out as subsurfaces. Every cell of the sheet stays
+a frame, so frame indices and animation timing match the sheet. In the atlas,
+fully transparent frames share one placeholder rect and identical frames share
+one rect.
+"""
+import pygame as pg, os, glob, json, math
 
 SRC      = "sprites"          # folder with the big sprite sheets
-DEST     = "sprite_frames"    # where single frames will go
+DEST     = "sprite_frames"    # where the atlases and indexes will go
 FRAME_W  = 32                 # width of one frame (pixels)
 FRAME_H  = 32                 # height of one frame (pixels)
 
-os.makedirs(DEST, exist_ok=True)
 
-for file in glob.glob(os.path.join(SRC, "*.png")):
-    sheet = pg.image.load(file).convert_alpha()
-    sheet_w, sheet_h = sheet.get_size()
-    cols = sheet_w // FRAME_W
-    rows = sheet_h // FRAME_H
-    base_name = os.path.basename(file).replace(".png", "")
+def slice_frames(sheet, frame_w, frame_h, name="sheet"):
+    """
+    Return every frame of a sheet in row-major order, blank ones included.
+    Raises ValueError if the sheet is smaller than one frame.
+    """
+    frames = []
+    for r in range(sheet.get_height() // frame_h):
+        for c in range(sheet.get_width() // frame_w):
+            frames.append(sheet.subsurface((c * frame_w, r * frame_h, frame_w, frame_h)))
+    if not frames:
+        w, h = sheet.get_size()
+        raise ValueError(f"{name} ({w}x{h}) has no {frame_w}x{frame_h} frames")
+    return frames
+
+
+def pack_atlas(frames, frame_w, frame_h):
+    """
+    Pack equally sized frames into a near-square grid.
+    Returns (atlas surface, list of [x, y, w, h] per input frame).
+    """
+    unique = {}  # pixel bytes -> slot index, so repeated frames are stored once
+    slots = []
+    order = []
+    for frame in frames:
+        # fully transparent frames (pauses) all point at one blank placeholder
+        key = None if frame.get_bounding_rect().w == 0 else pg.image.tobytes(frame, "RGBA")
+        if key not in unique:
+            unique[key] = len(slots)
+            slots.append(frame)
+        order.append(unique[key])
+    cols = max(1, math.ceil(math.sqrt(len(slots))))
+    rows = max(1, math.ceil(len(slots) / cols))
+    atlas = pg.Surface((cols * frame_w, rows * frame_h), pg.SRCALPHA)
+    rects = []
+    for i, frame in enumerate(slots):
+        x, y = (i % cols) * frame_w, (i // cols) * frame_h
+        if frame.get_bounding_rect().w:
+            atlas.blit(frame, (x, y))
+        rects.append([x, y, frame_w, frame_h])
+    return atlas, [rects[i] for i in order]
+
+
+def build(src=SRC, dest=DEST, frame_w=FRAME_W, frame_h=FRAME_H):
+    """
+    Pack every sheet in `src` into `dest`. Returns the index files written.
+    """
+    os.makedirs(dest, exist_ok=True)
+    written = []
+    for file in sorted(glob.glob(os.path.join(src, "*.png"))):
+        sheet = pg.image.load(file)
+        base_name = os.path.basename(file).replace(".png", "")
+        atlas, rects = pack_atlas(slice_frames(sheet, frame_w, frame_h, file), frame_w, frame_h)
+        pg.image.save(atlas, os.path.join(dest, f"{base_name}.png"))
+        index_path = os.path.join(dest, f"{base_name}.json")
+        with open(index_path, "w") as f:
+            json.dump({"image": f"{base_name}.png", "frames": rects}, f, separators=(",", ":"))
+        written.append(index_path)
+    return written
 
-    for r in range(rows):
-        for c in range(cols):
-            frame = sheet.subsurface((c * FRAME_W, r * FRAME_H, FRAME_W, FRAME_H))
-            out_path = os.path.join(DEST, f"{base_name}_{r:02}_{c:02}.png")
-            pg.image.save(frame, out_path)
 
-print("Done – frames are in", DEST)
+if __name__ == "__main__":
+    written = build()
+    print("Done – packed", len(written), "atlases into", DEST)